@@ -1,22 +1,93 @@
-from fastapi import APIRouter, status, Depends, HTTPException
-from app.core.schemas.document import Document, PaginatedDocument
+from fastapi import APIRouter, status, Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from app.core.schemas.document import Document, DocumentFields, DocumentImport, DocumentSuggestion, DocumentVersion, PaginatedDocument, PaginatedDocumentSummary
 from app.core.models.document_data import DocumentData
+from app.core.models.content_patch import ContentPatch
 from app.core.models.user_data import UserData
-from app.dbs import document_collection, user_collection
-from app.API.users import get_current_user
+from app.dbs import get_document_collection, get_user_collection, get_favourite_collection
+from app.API.users import get_current_user, authenticate_token
 from app.core.schemas.user import User, PaginatedUser
 from app.core.models.visibility_data import VisibilityData
+from app.core.search import build_search_request, search_keywords, suggest_key, tokenize
+from app.core.pagination import paginate_documents
+from app.core.cache import document_cache
+from app.core.search_cache import search_cache
+from app.core.suggestions import suggest_documents
+from app.core.settings import settings
+from app.core.etags import document_etag, etag_matches, if_match_version, not_modified, conditional_page
+from app.core.patches import required_length, splice_pipeline
+from app.core.collaboration import edit_sessions, SessionDocumentNotFound
+from app.core.events import event_bus, document_audience
+from app.core.ndjson import read_lines
 from datetime import datetime
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from pymongo import ReturnDocument
-from typing import List
-import re
-from emoji import EMOJI_DATA
-def is_emoji(s):
-    return s in EMOJI_DATA
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pydantic import ValidationError
+from typing import List, Optional, Tuple, Union
+from functools import partial
+import orjson
+from app.core.emojis import is_emoji
 
 router = APIRouter()
 
+async def raise_not_found_or_forbidden(
+        document_collection,
+        document_id: ObjectId,
+        not_found_exception: HTTPException,
+        forbidden_exception: HTTPException,
+        permission: Optional[dict] = None,
+        precondition_failed_exception: Optional[HTTPException] = None
+    ):
+    if precondition_failed_exception is not None:
+        if await document_collection.find_one({"_id": document_id, **permission}, {"_id": 1}) is not None:
+            raise precondition_failed_exception
+    if await document_collection.find_one({"_id": document_id}, {"_id": 1}) is None:
+        raise not_found_exception
+    raise forbidden_exception
+
+def invalid_document_detail(document: DocumentData) -> Optional[str]:
+    if not is_emoji(document.emoji):
+        return "Emoji field must be an emoji"
+    if document.title == "":
+        return "Title cannot be empty"
+    return None
+
+def build_document(document: DocumentData, author: str) -> dict:
+    return {
+        "title": document.title,
+        "content": document.content,
+        "author": author,
+        "emoji": document.emoji,
+        "editors": [],
+        "public": True,
+        "creation_date": datetime.now(),
+        "search_keywords": search_keywords(document.title),
+        "title_key": suggest_key(document.title),
+        "version": 1
+    }
+
+def validation_detail(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in problem['loc'])}: {problem['msg']}" for problem in error.errors())
+
+async def insert_import_batch(document_collection, batch: List[Tuple[int, dict]], username: str) -> List[Tuple[int, str]]:
+    """
+    Inserts one batch of imported documents unordered and returns the
+    lines that could not be stored.
+    """
+    failed = {}
+    try:
+        await document_collection.insert_many([document for _, document in batch], ordered = False)
+    except BulkWriteError as error:
+        for write_error in error.details["writeErrors"]:
+            failed[write_error["index"]] = write_error["errmsg"]
+
+    search_cache.invalidate()
+    for index, (_, document) in enumerate(batch):
+        if index not in failed:
+            event_bus.publish("created", document["_id"], document_audience(document), version = 1, user = username)
+    return [(batch[index][0], detail) for index, detail in failed.items()]
+
 @router.post(
         "", 
         status_code = status.HTTP_201_CREATED,
@@ -27,71 +98,140 @@ async def create_document(
         current_user: User = Depends(get_current_user)
     ):
 
-    title_bad_request_exception = HTTPException(
+    invalid_detail = invalid_document_detail(document)
+    if invalid_detail is not None:
+        bad_request_exception = HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Title cannot be empty",
+            detail=invalid_detail,
         )
-    
-    emoji_bad_request_exception = HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Emoji field must be an emoji",
-        )
-    if not is_emoji(document.emoji):
-        raise emoji_bad_request_exception  
-
-    if document.title == "":
-        raise title_bad_request_exception
-        
-
-    new_document = {
-        "title": document.title,
-        "content": document.content,
-        "author": current_user["username"],
-        "emoji": document.emoji,
-        "editors": [],
-        "public": True,
-        "creation_date": datetime.now()
-    }
+        raise bad_request_exception
 
-    _id = document_collection.insert_one(new_document)
+    new_document = build_document(document, current_user["username"])
+    _id = await get_document_collection().insert_one(new_document)
     new_document["id"] = _id.inserted_id
+    search_cache.invalidate()
+    event_bus.publish("created", _id.inserted_id, document_audience(new_document), version = 1, user = current_user["username"])
     return new_document
 
+@router.post(
+        "/import",
+        status_code = status.HTTP_200_OK,
+        response_model = DocumentImport
+    )
+async def import_documents(
+        request: Request,
+        current_user: User = Depends(get_current_user)
+    ):
+    """
+    Creates documents from an NDJSON body, one object with title, content
+    and emoji per line. Lines are validated like create_document as they
+    arrive and stored in batches; invalid lines are reported by number and
+    do not stop the import.
+    """
+    document_collection = get_document_collection()
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    def report(number: int, detail: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < settings.IMPORT_MAX_ERRORS:
+            errors.append((number, detail))
+
+    async def flush():
+        nonlocal imported
+        batch_failures = await insert_import_batch(document_collection, batch, current_user["username"])
+        imported += len(batch) - len(batch_failures)
+        for number, detail in batch_failures:
+            report(number, detail)
+        batch.clear()
+
+    async for number, line in read_lines(request.stream(), settings.IMPORT_MAX_LINE_BYTES):
+        if line is None:
+            report(number, f"Line is longer than {settings.IMPORT_MAX_LINE_BYTES} bytes")
+            continue
+        if not line.strip():
+            continue
+        try:
+            document = DocumentData.parse_obj(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            report(number, "Line is not valid JSON")
+            continue
+        except ValidationError as error:
+            report(number, validation_detail(error))
+            continue
+        invalid_detail = invalid_document_detail(document)
+        if invalid_detail is not None:
+            report(number, invalid_detail)
+            continue
+
+        batch.append((number, build_document(document, current_user["username"])))
+        if len(batch) == settings.IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    return DocumentImport(
+        imported = imported,
+        failed = failed,
+        errors = [{"line": number, "detail": detail} for number, detail in sorted(errors)]
+    )
+
 
 
 @router.get(
     "/search", 
     status_code = status.HTTP_200_OK,
-    response_model = PaginatedDocument
+    response_model = Union[PaginatedDocument, PaginatedDocumentSummary]
 )
 async def search_document(
         query: str = "",
-        page: int = 1,
-        page_size: int = 10,
+        page: int = Query(1, ge = 1),
+        page_size: int = Query(10, ge = 1, le = settings.PAGINATION_MAX_PAGE_SIZE),
+        prefix: bool = False,
+        cursor: Optional[str] = None,
+        include_total: Optional[bool] = None,
+        fields: DocumentFields = DocumentFields.full,
+        if_none_match: Optional[str] = Header(None),
     ):
 
-    search_expr = re.compile(f".*{query}.*", re.I)
-
-    search_request = {
-        '$and': [
-            {'public': True}, 
-            {'$or': [
-                    {'author': {'$regex': search_expr}},
-                    {'title': {'$regex': search_expr}},
-                    {'content': {'$regex': search_expr}}
-            ]}
-        ]
-    }
-
-    get_documents = document_collection.find(search_request).sort("creation_date", -1).skip((page - 1) * page_size).limit(page_size)
-    documents = [Document(**document) for document in get_documents]
+    search_request, ranked = build_search_request(query, prefix)
+    terms = tokenize(query)
+
+    # The filter depends only on the query's tokens, so equivalent queries share entries.
+    page_key = search_cache.page_key(tuple(terms), prefix, page if cursor is None else cursor, page_size, include_total, fields)
+    documents = search_cache.pages.get(page_key)
+    if documents is not None:
+        return conditional_page(documents, if_none_match)
+
+    count = search_cache.counter(get_document_collection(), (tuple(terms), prefix))
+    if ranked and cursor is None:
+        documents = await paginate_documents(
+            get_document_collection(), search_request, page, page_size, cursor, include_total,
+            projection = {"score": {"$meta": "textScore"}},
+            sort = [("score", {"$meta": "textScore"}), ("creation_date", -1), ("_id", -1)],
+            fields = fields,
+            terms = terms,
+            count = count
+        )
+    else:
+        documents = await paginate_documents(get_document_collection(), search_request, page, page_size, cursor, include_total, fields = fields, terms = terms, count = count)
+    search_cache.pages.set(page_key, documents)
+    return conditional_page(documents, if_none_match)
 
-    return PaginatedDocument(
-        current_page = page,
-        total_pages = document_collection.count_documents(search_request) // page_size + 1,
-        page_size = page_size,
-        documents = documents
-    )
+@router.get(
+    "/suggest",
+    status_code = status.HTTP_200_OK,
+    response_model = List[DocumentSuggestion]
+)
+async def suggest_document_titles(
+        prefix: str = "",
+        limit: int = 10
+    ):
+    limit = max(1, min(limit, settings.SUGGEST_MAX_LIMIT))
+    return await suggest_documents(get_document_collection(), prefix, limit)
 
 @router.get(
         "/{document_id}", 
@@ -100,6 +240,8 @@ async def search_document(
     )
 async def get_document_by_id(
         document_id: str,
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
         current_user: User = Depends(get_current_user)
     ):
 
@@ -113,12 +255,29 @@ async def get_document_by_id(
         detail="You are not authorized to view this document"
     )
 
-    get_document = document_collection.find_one({"_id": ObjectId(document_id)})
+    get_document = document_cache.get(ObjectId(document_id))
+    if get_document is None and if_none_match is not None:
+        current_version = await get_document_collection().find_one(
+            {"_id": ObjectId(document_id)},
+            {"author": 1, "public": 1, "version": 1, "is_editor": {'$in': [{'$literal': current_user["username"]}, {'$ifNull': ["$editors", []]}]}}
+        )
+        if current_version is None:
+            raise not_found_exception
+        if current_version["public"] == False and not current_version["author"] == current_user["username"] and not current_version["is_editor"]:
+            raise forbidden_exception
+        if etag_matches(if_none_match, document_etag(current_version)):
+            return not_modified(document_etag(current_version))
+
     if get_document is None:
-        raise not_found_exception
+        get_document = await document_cache.load(ObjectId(document_id), partial(get_document_collection().find_one, {"_id": ObjectId(document_id)}))
+        if get_document is None:
+            raise not_found_exception
     if get_document["public"] == False and not get_document["author"] == current_user["username"] and not current_user["username"] in get_document["editors"]:
         raise forbidden_exception
 
+    if etag_matches(if_none_match, document_etag(get_document)):
+        return not_modified(document_etag(get_document))
+    response.headers["ETag"] = document_etag(get_document)
     return get_document
 
 
@@ -129,8 +288,8 @@ async def get_document_by_id(
 )
 async def get_document_editors(
         document_id: str,
-        page: int = 1,
-        page_size: int = 10,
+        page: int = Query(1, ge = 1),
+        page_size: int = Query(10, ge = 1, le = settings.PAGINATION_MAX_PAGE_SIZE),
         current_user: User = Depends(get_current_user)
     ):
 
@@ -144,15 +303,25 @@ async def get_document_editors(
         detail="You are not authorized to view the editors of this document"
     )
 
-    edit_document = document_collection.find_one({"_id": ObjectId(document_id)})
+    editors = {'$ifNull': ["$editors", []]}
+    edit_document = await get_document_collection().find_one(
+        {"_id": ObjectId(document_id)},
+        {
+            "author": 1,
+            "public": 1,
+            "editors": {'$slice': [max(0, (page - 1) * page_size), page_size]},
+            "editor_count": {'$size': editors},
+            "is_editor": {'$in': [{'$literal': current_user["username"]}, editors]}
+        }
+    )
     if edit_document is None:
         raise document_not_found_exception
-    if not edit_document["author"] == current_user["username"] and not current_user["username"] in edit_document["editors"] and edit_document["public"] == False:
+    if not edit_document["author"] == current_user["username"] and not edit_document["is_editor"] and edit_document["public"] == False:
         raise forbidden_exception  
         
     return PaginatedUser(
         current_page = page,
-        total_pages = len(edit_document["editors"]) // page_size + 1,
+        total_pages = edit_document["editor_count"] // page_size + 1,
         page_size = page_size,
         users = edit_document["editors"]
     )
@@ -165,6 +334,8 @@ async def get_document_editors(
 async def edit_document_by_id(
         document_id: str,
         document: DocumentData,
+        response: Response,
+        if_match: Optional[str] = Header(None),
         current_user: User = Depends(get_current_user)
     ):
 
@@ -178,28 +349,155 @@ async def edit_document_by_id(
         detail="You are not authorized to edit this document"
     )
 
-    edit_document = document_collection.find_one({"_id": ObjectId(document_id)})
-    if edit_document is None:
-        raise not_found_exception
-    if not edit_document["author"] == current_user["username"] and not current_user["username"] in edit_document["editors"]:
-        raise forbidden_exception
+    precondition_failed_exception = HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Document has been modified since it was read"
+    )
 
-    new_title = document.title
+    changes = {"content": document.content, "emoji": document.emoji}
+    if not document.title == "":
+        changes["title"] = document.title
+        changes["search_keywords"] = search_keywords(document.title)
+        changes["title_key"] = suggest_key(document.title)
+
+    can_edit = {'$or': [{"author": current_user["username"]}, {"editors": current_user["username"]}]}
+    edit_filter = {"_id": ObjectId(document_id), **can_edit}
+    expected_version = if_match_version(if_match, document_id)
+    if expected_version is not None:
+        edit_filter["version"] = expected_version or None
+
+    document_collection = get_document_collection()
+    return_document = await document_collection.find_one_and_update(
+        edit_filter,
+        {'$set': changes, '$inc': {"version": 1}},
+        return_document = ReturnDocument.AFTER
+    )
+    document_cache.pop(ObjectId(document_id))
+    if return_document is None:
+        await raise_not_found_or_forbidden(
+            document_collection, ObjectId(document_id), not_found_exception, forbidden_exception,
+            can_edit, precondition_failed_exception if expected_version is not None else None
+        )
+    search_cache.invalidate()
+    event_bus.publish("edited", return_document["_id"], document_audience(return_document), private = not return_document["public"], version = return_document["version"], user = current_user["username"])
+    response.headers["ETag"] = document_etag(return_document)
+    return return_document
 
-    if document.title == "":
-        new_title = edit_document["title"]
-    
 
-    return_document = document_collection.find_one_and_update({"_id": ObjectId(document_id)}, { '$set': { "title" :  new_title, "content": document.content, "emoji": document.emoji} },  return_document = ReturnDocument.AFTER)
+@router.patch(
+        "/{document_id}/content", 
+        status_code = status.HTTP_200_OK,
+        response_model = DocumentVersion
+    )
+async def patch_document_content_by_id(
+        document_id: str,
+        patch: ContentPatch,
+        response: Response,
+        current_user: User = Depends(get_current_user)
+    ):
+
+    not_found_exception = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Specified document not found"
+    )
+
+    forbidden_exception = HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="You are not authorized to edit this document"
+    )
+
+    conflict_exception = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Document has been modified since the base version"
+    )
+
+    out_of_range_exception = HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Patch operations fall outside the document content"
+    )
+
+    username = {'$literal': current_user["username"]}
+    document_collection = get_document_collection()
+    return_document = await document_collection.find_one_and_update(
+        {
+            "_id": ObjectId(document_id),
+            '$or': [{"author": current_user["username"]}, {"editors": current_user["username"]}],
+            "version": patch.base_version or None,
+            '$expr': {'$gte': [{'$strLenCP': "$content"}, required_length(patch.operations)]}
+        },
+        splice_pipeline(patch.operations) + [{'$set': {"version": {'$add': [{'$ifNull': ["$version", 0]}, 1]}}}],
+        projection = {"author": 1, "editors": 1, "public": 1, "version": 1, "content_length": {'$strLenCP': "$content"}},
+        return_document = ReturnDocument.AFTER
+    )
+    document_cache.pop(ObjectId(document_id))
+
+    if return_document is None:
+        current_document = await document_collection.find_one(
+            {"_id": ObjectId(document_id)},
+            {"author": 1, "version": 1, "is_editor": {'$in': [username, {'$ifNull': ["$editors", []]}]}}
+        )
+        if current_document is None:
+            raise not_found_exception
+        if not current_document["author"] == current_user["username"] and not current_document["is_editor"]:
+            raise forbidden_exception
+        if not current_document.get("version", 0) == patch.base_version:
+            raise conflict_exception
+        raise out_of_range_exception
+
+    search_cache.invalidate()
+
+    event_bus.publish("edited", return_document["_id"], document_audience(return_document), private = not return_document["public"], version = return_document["version"], user = current_user["username"])
+    response.headers["ETag"] = document_etag(return_document)
     return return_document
 
 
+@router.websocket("/{document_id}/session")
+async def edit_document_session(
+        websocket: WebSocket,
+        document_id: str,
+        token: str
+    ):
+
+    try:
+        current_user = await authenticate_token(token)
+        document = await get_document_collection().find_one(
+            {"_id": ObjectId(document_id), '$or': [{"author": current_user["username"]}, {"editors": current_user["username"]}]},
+            {"_id": 1}
+        )
+    except (HTTPException, InvalidId):
+        document = None
+    if document is None:
+        await websocket.close(code = status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        session = await edit_sessions.join(document["_id"], websocket, current_user["username"])
+    except SessionDocumentNotFound:
+        await websocket.close(code = status.WS_1008_POLICY_VIOLATION)
+        return
+
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            await edit_sessions.receive(session, websocket, message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await edit_sessions.leave(session, websocket)
+
+
 @router.put(
 "/{document_id}/favourite", 
 status_code = status.HTTP_200_OK
 )
 async def change_favourite_document_status_by_id(
         document_id: str,
+        favourite: Optional[bool] = None,
         current_user: User = Depends(get_current_user)
     ):
 
@@ -213,20 +511,25 @@ async def change_favourite_document_status_by_id(
         detail="You are not authorized to view this document"
     )
 
-    fav_document = document_collection.find_one({"_id": ObjectId(document_id)})
-    if fav_document is None and ObjectId(document_id) in current_user["favourites"]:
-        user_collection.update_one({'username': current_user["username"]},{'$pull': {'favourites': ObjectId(document_id)}})
-        return {}
-    elif fav_document is None: 
+    favourite_collection = get_favourite_collection()
+    user_favourite = {"user": current_user["username"], "document": ObjectId(document_id)}
+    if not favourite:
+        unfavourite = await favourite_collection.delete_one(user_favourite)
+        event_bus.unfollow(current_user["username"], ObjectId(document_id))
+        if unfavourite.deleted_count or favourite == False:
+            return {}
+
+    fav_document = await get_document_collection().find_one({"_id": ObjectId(document_id)}, {"author": 1, "editors": 1, "public": 1})
+    if fav_document is None: 
         raise document_not_found_exception
-    if fav_document["public"] == False and not fav_document["author"] == current_user["username"] and not current_user in fav_document["editors"]:
+    if fav_document["public"] == False and not fav_document["author"] == current_user["username"] and not current_user["username"] in fav_document["editors"]:
         raise forbidden_exception  
         
-
-    if fav_document["_id"] in current_user["favourites"]:
-        user_collection.update_one({'username': current_user["username"]},{'$pull': {'favourites': fav_document["_id"]}})
-    else :
-        user_collection.update_one({'username': current_user["username"]},{'$push': {'favourites': fav_document["_id"]}})
+    try:
+        await favourite_collection.update_one(user_favourite, {'$setOnInsert': {"created_at": datetime.now()}}, upsert = True)
+    except DuplicateKeyError:
+        pass
+    event_bus.follow(current_user["username"], ObjectId(document_id))
     
     return {}
 
@@ -262,22 +565,46 @@ async def change_document_editor_by_username(
     )
 
 
-    edit_document = document_collection.find_one({"_id": ObjectId(document_id)})
-    if edit_document is None:
+    document_collection = get_document_collection()
+    document = await document_collection.find_one({"_id": ObjectId(document_id)}, {"author": 1})
+    if document is None:
         raise document_not_found_exception
-    if not edit_document["author"] == current_user["username"]:
-        raise forbidden_exception  
+    if not document["author"] == current_user["username"]:
+        raise forbidden_exception
+    if editor.username == current_user["username"]:
+        raise editor_is_author_exception
 
-    subject_editor = user_collection.find_one({"username": editor.username})
+    subject_editor = await get_user_collection().find_one({"username": editor.username}, {"username": 1})
     if subject_editor is None:
         raise user_not_found_exception
-        
-    if subject_editor["username"] in edit_document["editors"]:
-        return_document = document_collection.find_one_and_update({"_id": ObjectId(document_id)}, { '$pull': { "editors" :  subject_editor["username"]} },  return_document = ReturnDocument.AFTER)
-    elif not subject_editor["username"] == edit_document["author"]:
-        return_document = document_collection.find_one_and_update({"_id": ObjectId(document_id)}, { '$push': { "editors" :  subject_editor["username"]} },  return_document = ReturnDocument.AFTER)
-    else:
-        raise editor_is_author_exception
+
+    editor_name = {"$literal": subject_editor["username"]}
+    toggle_editor = [{'$set': {
+        "editors": {'$cond': [
+            {'$in': [editor_name, "$editors"]},
+            {'$filter': {"input": "$editors", "cond": {'$ne': ["$$this", editor_name]}}},
+            {'$concatArrays': ["$editors", [editor_name]]}
+        ]},
+        "version": {'$add': [{'$ifNull': ["$version", 0]}, 1]}
+    }}]
+
+    # Save live edits while the editor being removed still has access.
+    await edit_sessions.flush_document(ObjectId(document_id))
+    return_document = await document_collection.find_one_and_update(
+        {"_id": ObjectId(document_id), "author": current_user["username"]},
+        toggle_editor,
+        return_document = ReturnDocument.AFTER
+    )
+    document_cache.pop(ObjectId(document_id))
+    if return_document is None:
+        await raise_not_found_or_forbidden(document_collection, ObjectId(document_id), document_not_found_exception, forbidden_exception)
+    await edit_sessions.revoke(return_document["_id"], document_audience(return_document))
+    search_cache.invalidate()
+    event_bus.publish(
+        "editors", return_document["_id"], document_audience(return_document) + [subject_editor["username"]],
+        private = not return_document["public"], version = return_document["version"], user = current_user["username"],
+        editor = subject_editor["username"], added = subject_editor["username"] in return_document["editors"]
+    )
     return return_document
 
 @router.put(
@@ -301,13 +628,14 @@ async def change_document_visibility_by_id(
         detail="You are not authorized to change the visibility of this document"
     )
 
-    edit_document = document_collection.find_one({"_id": ObjectId(document_id)})
-    if edit_document is None:
-        raise not_found_exception
-    if not edit_document["author"] == current_user["username"]:
-        raise forbidden_exception    
-
-    return_document = document_collection.find_one_and_update({"_id": ObjectId(document_id)}, { '$set': { "public" :  visibility.public} },  return_document = ReturnDocument.AFTER)
+    document_collection = get_document_collection()
+    return_document = await document_collection.find_one_and_update({"_id": ObjectId(document_id), "author": current_user["username"]}, { '$set': { "public" :  visibility.public}, '$inc': {"version": 1} },  return_document = ReturnDocument.AFTER)
+    document_cache.pop(ObjectId(document_id))
+    if return_document is None:
+        await raise_not_found_or_forbidden(document_collection, ObjectId(document_id), not_found_exception, forbidden_exception)
+    await edit_sessions.revoke(return_document["_id"], document_audience(return_document))
+    search_cache.invalidate()
+    event_bus.publish("visibility", return_document["_id"], document_audience(return_document), private = not return_document["public"], version = return_document["version"], user = current_user["username"], public = return_document["public"])
     return return_document
 
 
@@ -330,13 +658,14 @@ async def delete_document_by_id(
         detail="You are not authorized to delete this document"
     )
 
-    delete_document = document_collection.find_one({"_id": ObjectId(document_id)})
-    if delete_document is None:
-        raise not_found_exception
-
-    if not delete_document["author"] == current_user["username"]:
-        raise forbidden_exception
-    
-    document_collection.delete_one({"_id": delete_document["_id"]})
+    document_collection = get_document_collection()
+    deleted = await document_collection.find_one_and_delete({"_id": ObjectId(document_id), "author": current_user["username"]}, {"author": 1, "editors": 1, "public": 1})
+    document_cache.pop(ObjectId(document_id))
+    if deleted is None:
+        await raise_not_found_or_forbidden(document_collection, ObjectId(document_id), not_found_exception, forbidden_exception)
+    await edit_sessions.revoke(deleted["_id"], allowed = ())
+    search_cache.invalidate()
+    event_bus.publish("deleted", deleted["_id"], document_audience(deleted), private = not deleted["public"], user = current_user["username"])
+    await get_favourite_collection().delete_many({"document": ObjectId(document_id)})
 
     return {}
@@ -2,28 +2,30 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from app.core.models.token import Token
-from app.API.users import pwd_hasher
-from jose import jwt
-from app.dbs import user_collection
+from app.core.hashing import password_hasher
+from app.core.metrics import PASSWORD_VERIFY_LATENCY
+from app.core.tokens import encode_access_token
+from app.dbs import get_user_collection
 from app.core.settings import settings
 from typing import Union
 
 router = APIRouter()
 
-def verify_pwd(
+async def verify_pwd(
         plain_pwd, 
         hashed_pwd
     ):
-    return pwd_hasher.verify(plain_pwd, hashed_pwd)
+    with PASSWORD_VERIFY_LATENCY.time():
+        return await password_hasher.verify(plain_pwd, hashed_pwd)
 
-def authenticate_user(
+async def authenticate_user(
         username: str, 
         password: str
     ):
-    user = user_collection.find_one({"username": username})
+    user = await get_user_collection().find_one({"username": username})
     if not user:
         return False
-    if not verify_pwd(password, user["password"]):
+    if not await verify_pwd(password, user["password"]):
         return False
     return user
 
@@ -41,7 +43,7 @@ def generate_access_token(
 
     to_encode.update({"exp": expiration_date})
 
-    return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_SIGNATURE_ALGORITHM)
+    return encode_access_token(to_encode)
 
 @router.post(
         "", 
@@ -51,7 +53,7 @@ def generate_access_token(
 async def login(
         login_form: OAuth2PasswordRequestForm = Depends()
     ):
-    user = authenticate_user(login_form.username, login_form.password)
+    user = await authenticate_user(login_form.username, login_form.password)
     if not user:
         raise HTTPException(
             headers={"WWW-Authenticate": "Bearer"},
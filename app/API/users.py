@@ -1,18 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from app.core.settings import settings
 from app.core.schemas.user import User, UserInDB
-from app.core.schemas.document import PaginatedDocument, Document
+from app.core.schemas.document import PaginatedDocument, PaginatedDocumentSummary, Document, DocumentFields
+from app.core.schemas.job import Job
 from app.core.models.user_credentials import UserCredentials
-from app.dbs import user_collection, document_collection
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from typing import List
+from app.core.pagination import KEYSET_SORT, paginate_documents, build_page, keyset_filter, next_cursor
+from app.core.snippets import summary_projection
+from app.core.etags import conditional_page
+from app.core.ndjson import stream_ndjson
+from app.core.cache import TTLCache, document_cache
+from app.core.search_cache import search_cache
+from app.core.search import suggest_key
+from app.core.suggestions import suggest_users
+from app.core.hashing import password_hasher
+from app.core.jobs import create_job, job_handler, report_progress, run_job
+from app.core.events import event_bus, stream_events
+from app.core.collaboration import edit_sessions
+from app.dbs import get_user_collection, get_document_collection, get_favourite_collection, get_job_collection
+from app.core.tokens import InvalidToken, decode_access_token
+from typing import List, Optional, Union
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
 import re
+import time
 
-pwd_hasher = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login", auto_error=False)
+token_cache = TTLCache(settings.TOKEN_CACHE_MAX_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS, name = "token")
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_MAX_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS, name = "principal")
+PRINCIPAL_PROJECTION = {"username": 1}
 router = APIRouter()
 
 @router.post(
@@ -42,11 +61,12 @@ async def register(
 
     new_user = {
         "username": user.username,
-        "password": pwd_hasher.hash(user.password),
-        "favourites": []
+        "username_key": suggest_key(user.username),
+        "password": await password_hasher.hash(user.password)
     }
 
-    user = user_collection.find_one({"username": new_user["username"]})
+    user_collection = get_user_collection()
+    user = await user_collection.find_one({"username": new_user["username"]})
 
     if user:
         raise HTTPException(
@@ -54,13 +74,31 @@ async def register(
                 detail="Specified username already exists"
             )
 
-    _id = user_collection.insert_one(new_user)
+    try:
+        _id = await user_collection.insert_one(new_user)
+    except DuplicateKeyError:
+        raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, 
+                detail="Specified username already exists"
+            )
+    principal_cache.pop(new_user["username"])
     new_user["id"] = _id.inserted_id
     return new_user
 
 async def get_current_user(
         jwt_token: str = Depends(oauth2_scheme)
     ):
+    return await authenticate_token(jwt_token)
+
+async def get_token_subject(
+        jwt_token: str = Depends(oauth2_scheme)
+    ) -> str:
+    # Only checks the token, so it also works once the account is deleted.
+    return token_subject(jwt_token)
+
+def token_subject(
+        jwt_token: str
+    ) -> str:
 
     bad_credentials_exception = HTTPException(
         headers={"WWW-Authenticate": "Bearer"},
@@ -68,21 +106,42 @@ async def get_current_user(
         detail="Bad credentials - could not validate"
     )
 
-    try:
-        jwt_payload = jwt.decode(jwt_token, settings.JWT_SECRET_KEY,
-        algorithms=[settings.JWT_SIGNATURE_ALGORITHM])
+    username = token_cache.get(jwt_token)
+    if username is None:
+        try:
+            jwt_payload = decode_access_token(jwt_token)
+
+            username: str = jwt_payload.get("sub")
 
-        username: str = jwt_payload.get("sub")
+            if username is None:
+                raise bad_credentials_exception
 
-        if username is None:
+        except InvalidToken:
             raise bad_credentials_exception
 
-    except JWTError:
-        raise bad_credentials_exception
+        ttl_seconds = settings.PRINCIPAL_CACHE_TTL_SECONDS
+        if jwt_payload.get("exp") is not None:
+            ttl_seconds = min(ttl_seconds, jwt_payload["exp"] - time.time())
+        token_cache.set(jwt_token, username, ttl_seconds)
+    return username
+
+async def authenticate_token(
+        jwt_token: str
+    ):
+
+    bad_credentials_exception = HTTPException(
+        headers={"WWW-Authenticate": "Bearer"},
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Bad credentials - could not validate"
+    )
 
-    user = user_collection.find_one({"username": username})
+    username = token_subject(jwt_token)
+    user = principal_cache.get(username)
     if user is None:
-        raise bad_credentials_exception
+        user = await get_user_collection().find_one({"username": username}, PRINCIPAL_PROJECTION)
+        if user is None:
+            raise bad_credentials_exception
+        principal_cache.set(username, user)
     return user
 
 @router.get(
@@ -91,64 +150,204 @@ async def get_current_user(
         status_code = status.HTTP_200_OK
     )
 async def get_current_user_profile(
+        response: Response,
         current_user: User = Depends(get_current_user)
     ):
-    return current_user
+    # Only the most recent favourites; the full list is paged by /users/me/favourites.
+    limit = settings.PROFILE_FAVOURITES_LIMIT
+    favourites = await get_favourite_collection().find({"user": current_user["username"]}, {"document": 1}).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(length = limit + 1)
+    if len(favourites) > limit:
+        response.headers["Link"] = '</users/me/favourites>; rel="favourites"'
+    return {**current_user, "favourites": [favourite["document"] for favourite in favourites[:limit]]}
+
+@router.get(
+        "/suggest",
+        status_code = status.HTTP_200_OK,
+        response_model = List[str]
+    )
+async def suggest_usernames(
+        prefix: str = "",
+        limit: int = 10,
+        current_user: User = Depends(get_current_user)
+    ):
+    limit = max(1, min(limit, settings.SUGGEST_MAX_LIMIT))
+    return await suggest_users(get_user_collection(), prefix, limit)
 
 @router.get(
         "/me/documents", 
-        response_model = PaginatedDocument, 
+        response_model = Union[PaginatedDocument, PaginatedDocumentSummary], 
         status_code = status.HTTP_200_OK
     )
 async def get_current_user_documents( 
         current_user: User = Depends(get_current_user),
-        page: int = 1,
-        page_size: int = 10,
+        page: int = Query(1, ge = 1),
+        page_size: int = Query(10, ge = 1, le = settings.PAGINATION_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        include_total: Optional[bool] = None,
+        fields: DocumentFields = DocumentFields.full,
+        if_none_match: Optional[str] = Header(None),
+    ):
+    documents = await paginate_documents(get_document_collection(), {"author": current_user["username"]}, page, page_size, cursor, include_total, fields = fields)
+    return conditional_page(documents, if_none_match)
 
+@router.get(
+        "/me/documents/export",
+        status_code = status.HTTP_200_OK
+    )
+async def export_current_user_documents(
+        current_user: User = Depends(get_current_user)
     ):
-    get_documents = list(document_collection.find({"author": current_user["username"]}).sort("creation_date", -1).skip((page - 1) * page_size).limit(page_size))
-    documents = [Document(**document) for document in get_documents]
+    documents = get_document_collection().find({"author": current_user["username"]}).sort(KEYSET_SORT)
+    return StreamingResponse(
+        stream_ndjson(documents, Document),
+        media_type = "application/x-ndjson",
+        headers = {"Content-Disposition": 'attachment; filename="documents.ndjson"'}
+    )
 
-    return PaginatedDocument(
-        current_page = page,
-        total_pages =  document_collection.count_documents({"author": current_user["username"]}) // page_size + 1,
-        page_size = page_size,
-        documents = documents
+@router.get(
+        "/me/shared", 
+        response_model = Union[PaginatedDocumentSummary, PaginatedDocument], 
+        status_code = status.HTTP_200_OK
     )
+async def get_current_user_shared_documents( 
+        current_user: User = Depends(get_current_user),
+        page: int = Query(1, ge = 1),
+        page_size: int = Query(10, ge = 1, le = settings.PAGINATION_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        include_total: Optional[bool] = None,
+        fields: DocumentFields = DocumentFields.summary,
+        if_none_match: Optional[str] = Header(None),
+    ):
+    documents = await paginate_documents(get_document_collection(), {"editors": current_user["username"]}, page, page_size, cursor, include_total, fields = fields)
+    return conditional_page(documents, if_none_match)
 
 @router.get(
     "/me/favourites", 
-    response_model = PaginatedDocument, 
+    response_model = Union[PaginatedDocument, PaginatedDocumentSummary], 
     status_code = status.HTTP_200_OK
 )
 async def get_current_user_favourites( 
         current_user: User = Depends(get_current_user),
-        page: int = 1,
-        page_size: int = 10,
+        page: int = Query(1, ge = 1),
+        page_size: int = Query(10, ge = 1, le = settings.PAGINATION_MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        include_total: Optional[bool] = None,
+        fields: DocumentFields = DocumentFields.full,
+        if_none_match: Optional[str] = Header(None),
     ):
-    get_documents = document_collection.find({"_id": {"$in": current_user["favourites"]}}).sort("creation_date", -1).skip((page - 1) * page_size).limit(page_size)
-    documents = [Document(**document) for document in get_documents]
-    
-    return PaginatedDocument(
-        current_page = page,
-        total_pages = document_collection.count_documents({"_id": {"$in": current_user["favourites"]}}) // page_size + 1,
+    favourite_collection = get_favourite_collection()
+    user_favourites = {"user": current_user["username"]}
+    if cursor is not None:
+        get_favourites = favourite_collection.find({'$and': [user_favourites, keyset_filter(cursor, "created_at")]}, {"document": 1, "created_at": 1})
+    else:
+        get_favourites = favourite_collection.find(user_favourites, {"document": 1, "created_at": 1}).skip(max(0, (page - 1) * page_size))
+    get_favourites = await get_favourites.sort([("created_at", -1), ("_id", -1)]).limit(page_size).to_list(length = page_size)
+
+    favourite_ids = [favourite["document"] for favourite in get_favourites]
+    projection = summary_projection() if fields == DocumentFields.summary else None
+    get_documents = await get_document_collection().find({"_id": {"$in": favourite_ids}}, projection).to_list(length = page_size)
+    position = {_id: index for index, _id in enumerate(favourite_ids)}
+    get_documents.sort(key = lambda document: position[document["_id"]])
+
+    if include_total is None:
+        include_total = cursor is None
+
+    documents = build_page(
+        get_documents,
+        fields,
+        current_page = page if cursor is None else None,
+        total_pages = await favourite_collection.count_documents(user_favourites) // page_size + 1 if include_total else None,
         page_size = page_size,
-        documents = documents
+        next_cursor = next_cursor(get_favourites, page_size, "created_at")
+    )
+    return conditional_page(documents, if_none_match)
+
+
+@router.get(
+    "/me/events",
+    status_code = status.HTTP_200_OK
+)
+async def get_current_user_events(
+        token: Optional[str] = None,
+        header_token: Optional[str] = Depends(optional_oauth2_scheme)
+    ):
+    # EventSource cannot send headers, so the token may also come as ?token=
+    current_user = await authenticate_token(header_token or token or "")
+
+    subscription = event_bus.subscribe(current_user["username"])
+    try:
+        favourites = get_favourite_collection().find({"user": current_user["username"]}, {"document": 1})
+        async for favourite in favourites:
+            event_bus.follow(current_user["username"], favourite["document"])
+    except Exception:
+        event_bus.unsubscribe(subscription)
+        raise
+
+    return StreamingResponse(
+        stream_events(subscription, settings.EVENT_KEEPALIVE_SECONDS),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+@job_handler("delete_user")
+async def delete_user_documents(job_id: str, username: str, deleted_before: datetime):
+    # The job is stored before the account is removed, so a failure at any
+    # step leaves a job to resume rather than orphaned documents.
+    await get_user_collection().delete_one({"username": username})
+    principal_cache.pop(username)
+    await edit_sessions.revoke_user(username)
+
+    document_collection = get_document_collection()
+    favourite_collection = get_favourite_collection()
+    owned_documents = {"author": username, "creation_date": {"$lte": deleted_before}}
+
+    while True:
+        batch = await document_collection.find(owned_documents, {"_id": 1}).limit(settings.ACCOUNT_DELETION_BATCH_SIZE).to_list(length = settings.ACCOUNT_DELETION_BATCH_SIZE)
+        if not batch:
+            break
+        document_ids = [document["_id"] for document in batch]
+        await favourite_collection.delete_many({"document": {"$in": document_ids}})
+        deleted = await document_collection.delete_many({"_id": {"$in": document_ids}})
+        for document_id in document_ids:
+            document_cache.pop(document_id)
+        search_cache.invalidate()
+        await report_progress(job_id, documents_deleted = deleted.deleted_count)
+
+    await favourite_collection.delete_many({"user": username, "created_at": {"$lte": deleted_before}})
+    shared = await document_collection.update_many({"editors": username, "creation_date": {"$lte": deleted_before}}, {'$pull': {"editors": username}})
+    search_cache.invalidate()
+    await report_progress(job_id, editor_entries_removed = shared.modified_count)
+
 @router.delete(
         "", 
-        status_code = status.HTTP_200_OK
+        status_code = status.HTTP_202_ACCEPTED,
+        response_model = Job
     )
 async def delete_user_by_username(
+        background_tasks: BackgroundTasks,
         current_user: User = Depends(get_current_user),
     ):
-    documents = document_collection.find({"author": current_user["username"]})
-    for document in documents:
-        document_collection.delete_one({"_id": document["_id"]})
-    user_collection.delete_one({"username": current_user["username"]})
-    return {}
+    job = await create_job("delete_user", current_user["username"], username = current_user["username"], deleted_before = datetime.now())
+    background_tasks.add_task(run_job, job["_id"])
+    return job
+
+@router.get(
+        "/jobs/{job_id}", 
+        response_model = Job,
+        status_code = status.HTTP_200_OK
+    )
+async def get_job_status(
+        job_id: str,
+        username: str = Depends(get_token_subject)
+    ):
+    job = await get_job_collection().find_one({"_id": job_id, "owner": username})
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Specified job not found"
+        )
+    return job
 
 
 def is_valid_password(password: str) -> bool:
@@ -0,0 +1,150 @@
+"""
+Load test for the collaborative editing sessions: opens hundreds of sockets on
+one document served by a single worker, lets a subset of them type and reports
+how long an edit takes to be acknowledged to its author and broadcast to every
+other editor.
+
+Start one worker against a disposable database, then run from the repository
+root:
+
+    uvicorn app.main:app --workers 1
+    python -m app.benchmarks.collaboration --sockets 300 --writers 30 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+import websockets
+from app.benchmarks.stats import percentiles
+
+def http(base_url: str, method: str, path: str, body = None, token: str = None, form: bool = False):
+    headers = {}
+    data = None
+    if body is not None and form:
+        data = urllib.parse.urlencode(body).encode()
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    elif body is not None:
+        data = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(base_url + path, data = data, headers = headers, method = method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read() or "null")
+
+def login(base_url: str, username: str) -> str:
+    password = "Benchmark123"
+    http(base_url, "POST", "/users", {"username": username, "password": password})
+    return http(base_url, "POST", "/login", {"username": username, "password": password}, form = True)["access_token"]
+
+class Client:
+    def __init__(self, index: int, sent: dict, results: dict):
+        self.index = index
+        self.sent = sent
+        self.results = results
+        self.revision = 0
+        self.ready = asyncio.Event()
+
+    async def listen(self, socket):
+        async for raw in socket:
+            message = json.loads(raw)
+            now = time.perf_counter()
+            if message["type"] in ("init", "reject", "reset", "edit"):
+                self.revision = message["revision"]
+                self.ready.set()
+            if message["type"] == "reject":
+                self.results["rejected"] += 1
+            elif message["type"] == "reset":
+                self.results["resets"] += 1
+            elif message["type"] == "edit":
+                text = message["operations"][0]["text"]
+                if text not in self.sent:
+                    continue
+                writer, sent_at = self.sent[text]
+                self.results["ack" if writer == self.index else "broadcast"].append(now - sent_at)
+
+    async def write(self, socket, stop: asyncio.Event, interval: float):
+        await self.ready.wait()
+        sequence = 0
+        while not stop.is_set():
+            text = f"[{self.index}:{sequence}]"
+            sequence += 1
+            self.sent[text] = (self.index, time.perf_counter())
+            await socket.send(json.dumps({
+                "type": "edit",
+                "base_revision": self.revision,
+                "operations": [{"start": 0, "end": 0, "text": text}]
+            }))
+            self.results["sent"] += 1
+            await asyncio.sleep(interval)
+
+async def run(args):
+    run_id = uuid.uuid4().hex[:8]
+    loop = asyncio.get_running_loop()
+    author = f"collab_{run_id}_0"
+    author_token = await loop.run_in_executor(None, login, args.url, author)
+    document = await loop.run_in_executor(None, lambda: http(
+        args.url, "POST", "/documents", {"title": f"Collaboration {run_id}", "content": "", "emoji": "📝"}, author_token
+    ))
+    tokens = [author_token]
+    for i in range(1, args.editors):
+        editor = f"collab_{run_id}_{i}"
+        tokens.append(await loop.run_in_executor(None, login, args.url, editor))
+        await loop.run_in_executor(None, lambda: http(
+            args.url, "PUT", f"/documents/{document['_id']}/editors", {"username": editor}, author_token
+        ))
+
+    sent = {}
+    results = {"sent": 0, "rejected": 0, "resets": 0, "ack": [], "broadcast": []}
+    stop = asyncio.Event()
+    ws_url = args.url.replace("http", "ws", 1)
+    sockets = []
+    connect_started = time.perf_counter()
+    for i in range(args.sockets):
+        socket = await websockets.connect(
+            f"{ws_url}/documents/{document['_id']}/session?token={tokens[i % len(tokens)]}",
+            max_size = None
+        )
+        sockets.append((Client(i, sent, results), socket))
+    connect_seconds = time.perf_counter() - connect_started
+
+    listeners = [asyncio.create_task(client.listen(socket)) for client, socket in sockets]
+    writers = [
+        asyncio.create_task(client.write(socket, stop, 1 / args.rate))
+        for client, socket in sockets[:args.writers]
+    ]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*writers)
+    await asyncio.sleep(1)
+    for _, socket in sockets:
+        await socket.close()
+    await asyncio.gather(*listeners, return_exceptions = True)
+
+    print(json.dumps({
+        "sockets": args.sockets,
+        "writers": args.writers,
+        "edits_per_writer_per_s": args.rate,
+        "seconds": args.seconds,
+        "connect_seconds": round(connect_seconds, 3),
+        "edits_sent": results["sent"],
+        "edits_rejected": results["rejected"],
+        "resets": results["resets"],
+        "edits_per_s": round(len(results["ack"]) / args.seconds, 1),
+        "ack_latency": percentiles(results["ack"]),
+        "broadcast_latency": percentiles(results["broadcast"]),
+    }, indent = 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default = "http://localhost:8000")
+    parser.add_argument("--sockets", type = int, default = 300)
+    parser.add_argument("--writers", type = int, default = 30)
+    parser.add_argument("--editors", type = int, default = 10)
+    parser.add_argument("--rate", type = float, default = 5.0)
+    parser.add_argument("--seconds", type = float, default = 20.0)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,13 @@
+"""
+Guard for the benchmarks that seed, wipe or drop a Mongo database: they must
+never run against the database the application is configured to use.
+"""
+from app.core.settings import settings
+
+# Captured on import: endpoints.py points settings.MONGODB_DATABASE at the
+# benchmark database before seeding.
+APPLICATION_DATABASE = settings.MONGODB_DATABASE
+
+def check_disposable(database: str):
+    if database == APPLICATION_DATABASE:
+        raise ValueError(f"refusing to seed over the application database {database!r} (MONGODB_DATABASE); pass a different --database")
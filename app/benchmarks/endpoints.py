@@ -0,0 +1,427 @@
+"""
+Load and latency benchmark for every HTTP route in app/API. Seeds a
+disposable database with a configurable amount of data, then drives each
+route in turn with concurrent clients and prints throughput and latency
+percentiles per route as JSON.
+
+By default the app is driven in-process against MONGODB_URL, so nothing else
+needs to be running. --mongo memory swaps Mongo for mongomock-motor, which
+lacks $text, the $substrCP/$slice/$size projections and the pipeline updates
+used by PATCH content and PUT editors; the scenarios that need them are
+reported as unsupported instead of being run. --url drives a running server
+instead, which must be started with MONGODB_DATABASE set to the --database
+used here.
+
+    python -m app.benchmarks.endpoints --users 100 --documents-per-user 20 --output results.json
+    python -m app.benchmarks.endpoints --baseline results.json --tolerance 0.2
+
+With --baseline, exits with status 1 when a route's p95 latency grew or its
+throughput dropped by more than the tolerance.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+import httpx
+from bson.objectid import ObjectId
+from app.core.settings import settings
+from app.core.hashing import hash_password
+from app.core.indexes import ensure_indexes
+from app.core.pagination import encode_cursor
+from app.core.search import search_keywords, suggest_key
+from app.benchmarks.stats import percentiles
+from app.benchmarks.databases import check_disposable
+from app.dbs import mongo, connect_to_mongo, close_mongo_connection, get_database
+
+PASSWORD = "Benchmark123"
+# Documents per import request; multiply the route's throughput by this.
+IMPORT_LINES = 200
+WORDS = [
+    "alpha", "budget", "cactus", "domperidog", "engine", "falcon", "garden", "harbor",
+    "island", "jungle", "kernel", "lantern", "marble", "nebula", "orbit", "pepper",
+    "quartz", "ribbon", "saddle", "timber", "umbra", "velvet", "walnut", "xenon",
+    "yonder", "zephyr", "meeting", "notes", "recipe", "travel", "project", "draft"
+]
+
+class BenchmarkState:
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+        self.usernames: List[str] = []
+        self.tokens: Dict[str, str] = {}
+        self.cursors: Dict[str, str] = {}
+        self.documents: List[Tuple[str, str]] = []
+        self.public_documents: List[str] = []
+        self.versions: Dict[str, int] = {}
+        self.disposable_documents: List[Tuple[str, str]] = []
+        self.disposable_users: List[str] = []
+        self.jobs: List[Tuple[str, str]] = []
+        self.sequence = itertools.count()
+        self._documents = None
+
+    def user(self) -> str:
+        return self.random.choice(self.usernames)
+
+    def headers(self, username: str) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[username]}"}
+
+    def next_document(self) -> Tuple[str, str]:
+        # Documents are handed out round robin so concurrent writers do not
+        # race on the same version.
+        if self._documents is None:
+            self._documents = itertools.cycle(self.documents)
+        return next(self._documents)
+
+class Scenario(NamedTuple):
+    name: str
+    call: Callable[[httpx.AsyncClient, BenchmarkState], Awaitable[httpx.Response]]
+    expected: Tuple[int, ...]
+    # Needs query features mongomock-motor does not implement.
+    server_only: bool
+
+SCENARIOS: List[Scenario] = []
+
+def scenario(name: str, expected: Tuple[int, ...] = (200,), server_only: bool = False):
+    def register(call):
+        SCENARIOS.append(Scenario(name, call, expected, server_only))
+        return call
+    return register
+
+def track_version(state: BenchmarkState, document_id: str, response: httpx.Response) -> httpx.Response:
+    if response.status_code == 200:
+        state.versions[document_id] = response.json()["version"]
+    return response
+
+@scenario("POST /login", (201,))
+async def login(client, state):
+    return await client.post("/login", data = {"username": state.user(), "password": PASSWORD})
+
+@scenario("POST /users", (201,))
+async def register(client, state):
+    return await client.post("/users", json = {"username": f"bench_new_{next(state.sequence)}", "password": PASSWORD})
+
+@scenario("GET /users/me")
+async def get_me(client, state):
+    return await client.get("/users/me", headers = state.headers(state.user()))
+
+@scenario("GET /users/me/documents")
+async def get_my_documents(client, state):
+    return await client.get("/users/me/documents", headers = state.headers(state.user()))
+
+@scenario("GET /users/me/documents?cursor", server_only = True)
+async def get_my_documents_cursor(client, state):
+    username = state.user()
+    return await client.get("/users/me/documents", params = {"cursor": state.cursors[username], "fields": "summary"}, headers = state.headers(username))
+
+@scenario("GET /users/me/documents/export")
+async def export_my_documents(client, state):
+    return await client.get("/users/me/documents/export", headers = state.headers(state.user()))
+
+@scenario("GET /users/me/shared", server_only = True)
+async def get_my_shared_documents(client, state):
+    return await client.get("/users/me/shared", headers = state.headers(state.user()))
+
+@scenario("GET /users/me/favourites")
+async def get_my_favourites(client, state):
+    return await client.get("/users/me/favourites", headers = state.headers(state.user()))
+
+@scenario("GET /documents/search", server_only = True)
+async def search_documents(client, state):
+    return await client.get("/documents/search", params = {"query": state.random.choice(WORDS)}, headers = state.headers(state.user()))
+
+@scenario("GET /documents/search?prefix")
+async def search_documents_prefix(client, state):
+    return await client.get("/documents/search", params = {"query": state.random.choice(WORDS)[:3], "prefix": True}, headers = state.headers(state.user()))
+
+@scenario("GET /documents/search?recent", server_only = True)
+async def search_recent_documents(client, state):
+    return await client.get("/documents/search", params = {"fields": "summary"}, headers = state.headers(state.user()))
+
+@scenario("GET /documents/suggest")
+async def suggest_documents(client, state):
+    word = state.random.choice(WORDS)
+    return await client.get("/documents/suggest", params = {"prefix": word[:state.random.randint(1, len(word))]})
+
+@scenario("GET /users/suggest")
+async def suggest_users(client, state):
+    return await client.get("/users/suggest", params = {"prefix": "bench_user_" + str(state.random.randrange(10))}, headers = state.headers(state.user()))
+
+@scenario("GET /documents/{id}")
+async def get_document(client, state):
+    document_id, author = state.random.choice(state.documents)
+    return await client.get(f"/documents/{document_id}", headers = state.headers(author))
+
+@scenario("GET /documents/{id}/editors", server_only = True)
+async def get_document_editors(client, state):
+    document_id, author = state.random.choice(state.documents)
+    return await client.get(f"/documents/{document_id}/editors", headers = state.headers(author))
+
+@scenario("POST /documents", (201,))
+async def create_document(client, state):
+    return await client.post("/documents", json = {"title": f"New {state.random.choice(WORDS)}", "content": "benchmark", "emoji": "📝"}, headers = state.headers(state.user()))
+
+@scenario("POST /documents/import")
+async def import_documents(client, state):
+    lines = [json.dumps({"title": f"Imported {state.random.choice(WORDS)}", "content": "benchmark", "emoji": "📝"}) for _ in range(IMPORT_LINES)]
+    return await client.post("/documents/import", content = "\n".join(lines), headers = state.headers(state.user()))
+
+@scenario("PUT /documents/{id}")
+async def edit_document(client, state):
+    document_id, author = state.next_document()
+    response = await client.put(
+        f"/documents/{document_id}",
+        json = {"title": "", "content": f"edited {next(state.sequence)}", "emoji": "📝"},
+        headers = state.headers(author)
+    )
+    return track_version(state, document_id, response)
+
+@scenario("PATCH /documents/{id}/content", server_only = True)
+async def patch_document(client, state):
+    document_id, author = state.next_document()
+    response = await client.patch(
+        f"/documents/{document_id}/content",
+        json = {"base_version": state.versions[document_id], "operations": [{"start": 0, "end": 0, "text": "+"}]},
+        headers = state.headers(author)
+    )
+    return track_version(state, document_id, response)
+
+@scenario("PUT /documents/{id}/favourite")
+async def favourite_document(client, state):
+    document_id = state.random.choice(state.public_documents)
+    return await client.put(f"/documents/{document_id}/favourite", headers = state.headers(state.user()))
+
+@scenario("PUT /documents/{id}/editors", server_only = True)
+async def toggle_document_editor(client, state):
+    document_id, author = state.next_document()
+    editor = state.user()
+    while editor == author:
+        editor = state.user()
+    response = await client.put(f"/documents/{document_id}/editors", json = {"username": editor}, headers = state.headers(author))
+    return track_version(state, document_id, response)
+
+@scenario("PUT /documents/{id}/visibility")
+async def change_document_visibility(client, state):
+    document_id, author = state.next_document()
+    response = await client.put(f"/documents/{document_id}/visibility", json = {"public": state.random.random() < 0.8}, headers = state.headers(author))
+    return track_version(state, document_id, response)
+
+@scenario("DELETE /documents/{id}")
+async def delete_document(client, state):
+    document_id, author = state.disposable_documents.pop()
+    return await client.delete(f"/documents/{document_id}", headers = state.headers(author))
+
+@scenario("DELETE /users", (202,))
+async def delete_user(client, state):
+    username = state.disposable_users.pop()
+    response = await client.delete("/users", headers = state.headers(username))
+    if response.status_code == 202:
+        state.jobs.append((response.json()["_id"], username))
+    return response
+
+@scenario("GET /users/jobs/{id}")
+async def get_job(client, state):
+    job_id, username = state.random.choice(state.jobs)
+    return await client.get(f"/users/jobs/{job_id}", headers = state.headers(username))
+
+async def seed(state: BenchmarkState, args):
+    from app.API.login import generate_access_token
+
+    database = get_database()
+    check_disposable(database.name)
+    for collection in ("users", "documents", "favourites", "jobs"):
+        await database[collection].delete_many({})
+    if not args.mongo == "memory":
+        await ensure_indexes(database)
+
+    password = hash_password(PASSWORD)
+    state.usernames = [f"bench_user_{i}" for i in range(args.users)]
+    state.disposable_users = [f"bench_gone_{i}" for i in range(args.requests)]
+    await database["users"].insert_many([
+        {"username": username, "username_key": suggest_key(username), "password": password}
+        for username in state.usernames + state.disposable_users
+    ])
+    expiration = timedelta(minutes = settings.JWT_TOKEN_EXPIRE_MINUTES)
+    for username in state.usernames + state.disposable_users:
+        state.tokens[username] = generate_access_token(payload = {"sub": username}, expiration = expiration)
+
+    content = (" ".join(WORDS) + " ") * (args.content_size // 200 + 1)
+    now = datetime.now()
+    documents = []
+    for index in range(args.users * args.documents_per_user + args.requests):
+        author = state.usernames[index % args.users]
+        title = " ".join(state.random.sample(WORDS, 3))
+        others = [username for username in state.random.sample(state.usernames, min(args.users, args.editors_per_document + 1)) if username != author]
+        documents.append({
+            "_id": ObjectId(),
+            "title": title,
+            "content": content[:args.content_size],
+            "author": author,
+            "emoji": "📝",
+            "editors": others[:args.editors_per_document],
+            "public": state.random.random() < 0.8,
+            "creation_date": now - timedelta(seconds = index),
+            "search_keywords": search_keywords(title),
+            "title_key": suggest_key(title),
+            "version": 1
+        })
+    for batch in range(0, len(documents), 1000):
+        await database["documents"].insert_many(documents[batch:batch + 1000])
+
+    kept, disposable = documents[:-args.requests or None], documents[len(documents) - args.requests:]
+    state.documents = [(str(document["_id"]), document["author"]) for document in kept]
+    state.disposable_documents = [(str(document["_id"]), document["author"]) for document in disposable]
+    state.versions = {str(document["_id"]): 1 for document in documents}
+    by_author = {}
+    for document in kept:
+        by_author.setdefault(document["author"], []).append(document)
+    for username, owned in by_author.items():
+        state.cursors[username] = encode_cursor(owned[len(owned) // 2])
+
+    public = [document["_id"] for document in kept if document["public"]]
+    state.public_documents = [str(document_id) for document_id in public]
+    favourites = []
+    for username in state.usernames:
+        for offset, document_id in enumerate(state.random.sample(public, min(len(public), args.favourites_per_user))):
+            favourites.append({"user": username, "document": document_id, "created_at": now - timedelta(seconds = offset)})
+    for batch in range(0, len(favourites), 1000):
+        await database["favourites"].insert_many(favourites[batch:batch + 1000])
+
+    return {
+        "users": len(state.usernames),
+        "documents": len(documents),
+        "favourites": len(favourites),
+        "content_size": args.content_size,
+    }
+
+async def run_scenario(client: httpx.AsyncClient, state: BenchmarkState, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = Counter()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status = (await scenario.call(client, state)).status_code
+            except httpx.HTTPError as exception:
+                status = type(exception).__name__
+            latencies.append(time.perf_counter() - started)
+            if status not in scenario.expected:
+                errors[str(status)] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "throughput_rps": round(requests / elapsed, 1),
+        "errors": dict(errors),
+        **percentiles(latencies),
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, route in results["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None or not route.get("count") or not before.get("count"):
+            continue
+        if route["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {route['p95_ms']}ms")
+        if route["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']}/s -> {route['throughput_rps']}/s")
+        if sum(route["errors"].values()) > sum(before["errors"].values()):
+            regressions.append(f"{name}: errors {before['errors']} -> {route['errors']}")
+    return regressions
+
+async def main(args) -> int:
+    check_disposable(args.database)
+    settings.MONGODB_DATABASE = args.database
+    if args.mongo == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            print("--mongo memory needs mongomock-motor: pip install mongomock-motor", file = sys.stderr)
+            return 2
+        mongo.client = AsyncMongoMockClient()
+    else:
+        await connect_to_mongo()
+
+    state = BenchmarkState(args.seed)
+    try:
+        data = await seed(state, args)
+        if args.url:
+            client = httpx.AsyncClient(base_url = args.url, timeout = 60)
+        else:
+            from app.main import app
+            transport = httpx.ASGITransport(app = app, raise_app_exceptions = False)
+            client = httpx.AsyncClient(transport = transport, base_url = "http://benchmark", timeout = 60)
+
+        routes = {}
+        async with client:
+            for scenario in SCENARIOS:
+                if args.routes and not any(route in scenario.name for route in args.routes):
+                    continue
+                if scenario.server_only and args.mongo == "memory":
+                    routes[scenario.name] = {"unsupported": "needs a MongoDB server"}
+                    continue
+                routes[scenario.name] = await run_scenario(client, state, scenario, args.requests, args.concurrency)
+                print(f"{scenario.name}: {json.dumps(routes[scenario.name])}", file = sys.stderr)
+    finally:
+        if not args.keep:
+            check_disposable(args.database)
+            await mongo.client.drop_database(args.database)
+        await close_mongo_connection()
+
+    results = {
+        "seeded": data,
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "mode": args.url or f"in-process ({args.mongo})",
+        "routes": routes,
+    }
+    output = json.dumps(results, indent = 2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file = sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help = "drive a running server instead of the app in-process")
+    parser.add_argument("--mongo", choices = ["server", "memory"], default = "server")
+    parser.add_argument("--database", default = "domperidog_benchmark")
+    parser.add_argument("--users", type = int, default = 100)
+    parser.add_argument("--documents-per-user", type = int, default = 20)
+    parser.add_argument("--editors-per-document", type = int, default = 2)
+    parser.add_argument("--favourites-per-user", type = int, default = 10)
+    parser.add_argument("--content-size", type = int, default = 2000)
+    parser.add_argument("--requests", type = int, default = 200, help = "requests per route")
+    parser.add_argument("--concurrency", type = int, default = 20)
+    parser.add_argument("--routes", nargs = "*", help = "only run routes whose name contains one of these")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--keep", action = "store_true", help = "keep the seeded database")
+    parser.add_argument("--output", help = "write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help = "JSON report of a previous run to compare against")
+    parser.add_argument("--tolerance", type = float, default = 0.2)
+    args = parser.parse_args()
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+    try:
+        check_disposable(args.database)
+    except ValueError as error:
+        parser.error(str(error))
+    sys.exit(asyncio.run(main(args)))
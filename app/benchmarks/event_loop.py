@@ -0,0 +1,109 @@
+"""
+Measures how much the event loop stalls while concurrent Mongo queries are in
+flight, comparing the old blocking pymongo calls with the async data layer.
+
+Run from the repository root against a disposable database:
+
+    python -m app.benchmarks.event_loop --documents 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+import pymongo
+from app.core.settings import settings
+from app.dbs import mongo, connect_to_mongo, close_mongo_connection
+from app.benchmarks.databases import check_disposable
+
+TICK_SECONDS = 0.005
+SLOW_QUERY = {"content": {"$regex": ".*domperidog.*", "$options": "i"}}
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+async def blocking_query(collection):
+    return collection.count_documents(SLOW_QUERY)
+
+async def async_query(collection):
+    return await collection.count_documents(SLOW_QUERY)
+
+async def run_mode(query, collection, concurrency: int, rounds: int):
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*[query(collection) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    lags.sort()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "queries_per_s": round(concurrency * rounds / elapsed, 1),
+        "heartbeats": len(lags),
+        "loop_lag_p50_ms": round(statistics.median(lags), 2) if lags else None,
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2) if lags else None,
+        "loop_lag_max_ms": round(lags[-1], 2) if lags else None,
+    }
+
+async def seed(collection, count: int):
+    check_disposable(collection.database.name)
+    await collection.delete_many({})
+    batch = []
+    for i in range(count):
+        batch.append({
+            "title": f"Benchmark note {i}",
+            "content": "lorem ipsum dolor sit amet " * 20,
+            "author": f"bench_user_{i % 100}",
+            "emoji": "📝",
+            "editors": [],
+            "public": True,
+            "creation_date": datetime.now()
+        })
+        if len(batch) == 1000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+async def main(args):
+    await connect_to_mongo()
+    async_collection = mongo.client[args.database]["documents"]
+    await seed(async_collection, args.documents)
+
+    sync_client = pymongo.MongoClient(settings.MONGODB_URL, maxPoolSize = settings.MONGODB_MAX_POOL_SIZE)
+    sync_collection = sync_client[args.database]["documents"]
+
+    results = {
+        "documents": args.documents,
+        "concurrency": args.concurrency,
+        "rounds": args.rounds,
+        "blocking": await run_mode(blocking_query, sync_collection, args.concurrency, args.rounds),
+        "async": await run_mode(async_query, async_collection, args.concurrency, args.rounds),
+    }
+
+    sync_client.close()
+    await async_collection.drop()
+    await close_mongo_connection()
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default = "domperidog_benchmark")
+    parser.add_argument("--documents", type = int, default = 20000)
+    parser.add_argument("--concurrency", type = int, default = 50)
+    parser.add_argument("--rounds", type = int, default = 5)
+    args = parser.parse_args()
+    try:
+        check_disposable(args.database)
+    except ValueError as error:
+        parser.error(str(error))
+    asyncio.run(main(args))
@@ -0,0 +1,102 @@
+"""
+Explains every query shape the routers in app/API run and fails when one of
+them is planned as a collection scan or needs an in-memory sort that was not
+explicitly accepted below.
+
+    python -m app.cli verify-indexes
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson.objectid import ObjectId
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from app.core.pagination import KEYSET_SORT, keyset_filter, encode_cursor
+from app.core.search import build_search_request, prefix_filter
+from app.core.snippets import summary_projection
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+    projection: Optional[dict] = None
+    # Reason an in-memory SORT stage is acceptable for this shape.
+    allow_sort: Optional[str] = None
+
+SAMPLE_USER = "explain_user"
+SAMPLE_ID = ObjectId()
+SAMPLE_DATE = datetime.now()
+SAMPLE_CURSOR = encode_cursor({"_id": SAMPLE_ID, "creation_date": SAMPLE_DATE})
+FAVOURITE_CURSOR = encode_cursor({"_id": SAMPLE_ID, "created_at": SAMPLE_DATE}, "created_at")
+TEXT_SEARCH, _ = build_search_request("domperidog notes")
+PREFIX_SEARCH, _ = build_search_request("domp", prefix = True)
+TEXT_SCORE = {"score": {"$meta": "textScore"}}
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("login.authenticate_user", "users", {"username": SAMPLE_USER}),
+    QueryShape("users.get_current_user", "users", {"username": SAMPLE_USER}),
+    QueryShape("users.get_current_user_documents", "documents", {"author": SAMPLE_USER}, KEYSET_SORT),
+    QueryShape("users.get_current_user_documents[cursor]", "documents", {'$and': [{"author": SAMPLE_USER}, keyset_filter(SAMPLE_CURSOR)]}, KEYSET_SORT),
+    QueryShape("users.export_current_user_documents", "documents", {"author": SAMPLE_USER}, KEYSET_SORT),
+    QueryShape("users.get_current_user_shared_documents", "documents", {"editors": SAMPLE_USER}, KEYSET_SORT, summary_projection()),
+    QueryShape("users.get_current_user_shared_documents[cursor]", "documents", {'$and': [{"editors": SAMPLE_USER}, keyset_filter(SAMPLE_CURSOR)]}, KEYSET_SORT, summary_projection()),
+    QueryShape("users.get_current_user_favourites", "favourites", {"user": SAMPLE_USER}, [("created_at", -1), ("_id", -1)]),
+    QueryShape("users.get_current_user_favourites[cursor]", "favourites", {'$and': [{"user": SAMPLE_USER}, keyset_filter(FAVOURITE_CURSOR, "created_at")]}, [("created_at", -1), ("_id", -1)]),
+    QueryShape("users.get_current_user_favourites[documents]", "documents", {"_id": {"$in": [SAMPLE_ID]}}),
+    QueryShape("users.delete_user_documents[owned]", "documents", {"author": SAMPLE_USER, "creation_date": {"$lte": SAMPLE_DATE}}),
+    QueryShape("users.delete_user_documents[favourites]", "favourites", {"document": {"$in": [SAMPLE_ID]}}),
+    QueryShape("users.delete_user_documents[own favourites]", "favourites", {"user": SAMPLE_USER, "created_at": {"$lte": SAMPLE_DATE}}),
+    QueryShape("users.delete_user_documents[editors]", "documents", {"editors": SAMPLE_USER, "creation_date": {"$lte": SAMPLE_DATE}}),
+    QueryShape("users.get_job_status", "jobs", {"_id": "0" * 32, "owner": SAMPLE_USER}),
+    QueryShape("jobs.claim_stale_job", "jobs", {"status": {'$in': ["pending", "running"]}, "heartbeat_at": {'$lt': SAMPLE_DATE}, "params": {'$exists': True}}),
+    QueryShape("users.suggest_usernames", "users", prefix_filter("username_key", "expl"), [("username_key", 1)], {"username": 1}),
+    QueryShape("documents.search_document", "documents", {"public": True}, KEYSET_SORT),
+    QueryShape("documents.search_document[cursor]", "documents", {'$and': [{"public": True}, keyset_filter(SAMPLE_CURSOR)]}, KEYSET_SORT),
+    QueryShape(
+        "documents.search_document[text]", "documents", TEXT_SEARCH,
+        [("score", {"$meta": "textScore"}), ("creation_date", -1), ("_id", -1)], TEXT_SCORE,
+        allow_sort = "text score is only known after matching"
+    ),
+    QueryShape(
+        "documents.search_document[prefix]", "documents", PREFIX_SEARCH, KEYSET_SORT,
+        allow_sort = "a range over the multikey search_keywords index cannot also provide recency order"
+    ),
+    QueryShape("documents.suggest_document_titles", "documents", {"public": True, **prefix_filter("title_key", "domp")}, [("title_key", 1)], {"title": 1, "emoji": 1}),
+    QueryShape("documents.get_document_by_id", "documents", {"_id": SAMPLE_ID}),
+    QueryShape("documents.edit_document_by_id", "documents", {"_id": SAMPLE_ID, '$or': [{"author": SAMPLE_USER}, {"editors": SAMPLE_USER}]}),
+    QueryShape("documents.change_document_visibility_by_id", "documents", {"_id": SAMPLE_ID, "author": SAMPLE_USER}),
+    QueryShape("documents.change_favourite_document_status_by_id", "favourites", {"user": SAMPLE_USER, "document": SAMPLE_ID}),
+    QueryShape("documents.delete_document_by_id[favourites]", "favourites", {"document": SAMPLE_ID}),
+]
+
+def plan_stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages += plan_stages(value)
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in plan_stages(item)]
+    return []
+
+async def explain_shape(database: AsyncIOMotorDatabase, shape: QueryShape) -> dict:
+    cursor = database[shape.collection].find(shape.filter, shape.projection)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    explanation = await cursor.limit(10).explain()
+    stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+    problems = []
+    if "COLLSCAN" in stages:
+        problems.append("COLLSCAN")
+    if "SORT" in stages and shape.allow_sort is None:
+        problems.append("in-memory SORT")
+    return {
+        "name": shape.name,
+        "collection": shape.collection,
+        "stages": stages,
+        "allowed_sort": shape.allow_sort if "SORT" in stages else None,
+        "problems": problems,
+    }
+
+async def verify_query_plans(database: AsyncIOMotorDatabase) -> List[dict]:
+    return [await explain_shape(database, shape) for shape in QUERY_SHAPES]
@@ -0,0 +1,141 @@
+"""
+Measures how throughput scales with the number of workers started by
+app.serve. For each worker count it starts the server against a seeded
+database, drives one route from several client processes and reports
+requests per second, latency percentiles and scaling efficiency (speedup
+over one worker divided by the worker count) as JSON.
+
+    python -m app.benchmarks.scaling --workers 1 2 4 8 --seconds 15
+
+The load generator shares the machine with the server, so leave it some
+cores (--client-processes) when reading the efficiency figures.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+from app.core.settings import settings
+from app.benchmarks.event_loop import seed
+from app.benchmarks.databases import check_disposable
+from app.benchmarks.stats import percentiles
+from app.dbs import mongo, connect_to_mongo, close_mongo_connection
+
+async def drive(url: str, path: str, concurrency: int, seconds: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(session: httpx.AsyncClient):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await session.get(path)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections = concurrency, max_keepalive_connections = concurrency)
+    async with httpx.AsyncClient(base_url = url, limits = limits, timeout = 30) as session:
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+    return {"latencies": latencies, "errors": errors}
+
+def client_process(arguments) -> dict:
+    return asyncio.run(drive(*arguments))
+
+def wait_until_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/", timeout = 1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start within {timeout}s")
+
+def run_workers(workers: int, args) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    environment = {**os.environ, "MONGODB_DATABASE": args.database}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(args.port), "--log-level", "warning"],
+        env = environment
+    )
+    try:
+        wait_until_ready(url)
+        with multiprocessing.Pool(args.client_processes) as pool:
+            pool.map(client_process, [(url, args.path, 2, 1.0)] * args.client_processes)
+            results = pool.map(client_process, [(url, args.path, args.concurrency, args.seconds)] * args.client_processes)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout = settings.GRACEFUL_SHUTDOWN_SECONDS + 10)
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "throughput_rps": round(len(latencies) / args.seconds, 1),
+        **percentiles(latencies),
+    }
+
+async def prepare(args):
+    await connect_to_mongo()
+    try:
+        await seed(mongo.client[args.database]["documents"], args.documents)
+    finally:
+        await close_mongo_connection()
+
+async def cleanup(args):
+    check_disposable(args.database)
+    await connect_to_mongo()
+    try:
+        await mongo.client.drop_database(args.database)
+    finally:
+        await close_mongo_connection()
+
+def main(args):
+    asyncio.run(prepare(args))
+    try:
+        runs = [run_workers(workers, args) for workers in args.workers]
+    finally:
+        asyncio.run(cleanup(args))
+
+    baseline = runs[0]["throughput_rps"] / runs[0]["workers"]
+    for run in runs:
+        run["speedup"] = round(run["throughput_rps"] / baseline, 2) if baseline else None
+        run["efficiency"] = round(run["speedup"] / run["workers"], 2) if baseline else None
+    print(json.dumps({
+        "path": args.path,
+        "documents": args.documents,
+        "cpu_count": os.cpu_count(),
+        "client_processes": args.client_processes,
+        "concurrency_per_client": args.concurrency,
+        "runs": runs,
+    }, indent = 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type = int, nargs = "+", default = [1, 2, 4])
+    parser.add_argument("--path", default = "/documents/search?fields=summary&page_size=20")
+    parser.add_argument("--database", default = "domperidog_benchmark")
+    parser.add_argument("--documents", type = int, default = 20000)
+    parser.add_argument("--port", type = int, default = 8100)
+    parser.add_argument("--client-processes", type = int, default = max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type = int, default = 32, help = "concurrent requests per client process")
+    parser.add_argument("--seconds", type = float, default = 15)
+    args = parser.parse_args()
+    try:
+        check_disposable(args.database)
+    except ValueError as error:
+        parser.error(str(error))
+    main(args)
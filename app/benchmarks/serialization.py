@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for encoding a PaginatedDocument: the validated path
+(models built with validation, re-validated against the response_model and
+encoded by FastAPI's JSONResponse) against the trusted path used by the list
+endpoints (models constructed without validation and encoded with orjson).
+
+    python -m app.benchmarks.serialization --sizes 10 50 100 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core.pagination import build_page
+from app.core.schemas.document import Document, PaginatedDocument
+from app.core.serialization import page_response
+
+RESPONSE_FIELD = create_response_field(name = "Response_search_document", type_ = PaginatedDocument)
+
+def mongo_documents(count: int, content_size: int) -> list:
+    return [{
+        "_id": ObjectId(),
+        "title": f"Benchmark note {i}",
+        "content": "lorem ipsum dolor sit amet " * (content_size // 27 + 1),
+        "author": f"bench_user_{i % 10}",
+        "emoji": "📝",
+        "editors": ["bench_user_1", "bench_user_2"],
+        "public": True,
+        "creation_date": datetime.now(),
+        "search_keywords": ["benchmark", "note", str(i)],
+        "version": 3
+    } for i in range(count)]
+
+async def validated(documents: list) -> bytes:
+    page = PaginatedDocument(current_page = 1, total_pages = 1, page_size = len(documents), next_cursor = None, documents = [Document(**document) for document in documents])
+    content = await serialize_response(field = RESPONSE_FIELD, response_content = page)
+    return JSONResponse(content).body
+
+async def trusted(documents: list) -> bytes:
+    response = page_response(build_page(documents, current_page = 1, total_pages = 1, page_size = len(documents), next_cursor = None))
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+async def measure(encode, documents: list, rounds: int) -> float:
+    await encode(documents)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await encode(documents)
+    return (time.perf_counter() - started) / rounds
+
+async def main(args):
+    results = []
+    for size in args.sizes:
+        documents = mongo_documents(size, args.content_size)
+        assert json.loads(await validated(documents)) == json.loads(await trusted(documents))
+        validated_seconds = await measure(validated, documents, args.rounds)
+        trusted_seconds = await measure(trusted, documents, args.rounds)
+        results.append({
+            "documents": size,
+            "validated_us": round(validated_seconds * 1e6, 1),
+            "trusted_us": round(trusted_seconds * 1e6, 1),
+            "speedup": round(validated_seconds / trusted_seconds, 2),
+        })
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [10, 50, 100, 500])
+    parser.add_argument("--content-size", type = int, default = 500)
+    parser.add_argument("--rounds", type = int, default = 200)
+    asyncio.run(main(parser.parse_args()))
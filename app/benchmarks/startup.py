@@ -0,0 +1,96 @@
+"""
+Profiles a cold start: imports app.main in a fresh interpreter with
+`-X importtime` and reports the total import time, the time spent in each
+app module and the heaviest third-party imports, then times the pieces that
+are initialized lazily on first use (emoji table, bcrypt context, jose).
+
+    python -m app.cli startup-profile
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Packages that app.main must not import; they load on first use instead.
+DEFERRED_MODULES = ("emoji", "jose", "passlib")
+
+STARTUP_BUDGET_MS = 1500
+
+LAZY_INITIALIZERS = {
+    "emoji_table": "from app.core.emojis import emoji_set; emoji_set()",
+    "bcrypt_context": "from app.core.hashing import get_pwd_context; get_pwd_context()",
+    "jose": "from app.core.tokens import decode_access_token; import jose.jwt",
+}
+
+FIRST_USE_SCRIPT = """
+import json, time
+import app.main
+timings = {}
+for name, statement in %r.items():
+    started = time.perf_counter()
+    exec(statement)
+    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+print(json.dumps(timings))
+"""
+
+def parse_importtime(stderr: str) -> list:
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": round(int(self_us) / 1000, 1),
+            "cumulative_ms": round(int(cumulative_us) / 1000, 1),
+        })
+    return imports
+
+def direct_dependencies(imports: list) -> dict:
+    """
+    Sums, per top-level package, the cumulative time of third-party modules
+    imported directly by an app module (importtime lists children before
+    their parent, so the log is walked backwards).
+    """
+    totals = {}
+    ancestors = []
+    for entry in reversed(imports):
+        del ancestors[entry["depth"]:]
+        package = entry["module"].split(".")[0]
+        if package != "app" and ancestors and ancestors[-1] == "app":
+            totals[package] = round(totals.get(package, 0) + entry["cumulative_ms"], 1)
+        ancestors.append(package)
+    return totals
+
+def profile_startup(top: int = 15) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output = True, text = True, check = True, cwd = ROOT
+    )
+    imports = parse_importtime(result.stderr)
+    app_main = next(entry for entry in imports if entry["module"] == "app.main")
+    app_modules = [entry for entry in imports if entry["module"].split(".")[0] == "app"]
+
+    first_use = subprocess.run(
+        [sys.executable, "-c", FIRST_USE_SCRIPT % LAZY_INITIALIZERS],
+        capture_output = True, text = True, check = True, cwd = ROOT
+    )
+    return {
+        "import_app_main_ms": app_main["cumulative_ms"],
+        "app_modules": sorted(
+            ({key: entry[key] for key in ("module", "self_ms", "cumulative_ms")} for entry in app_modules),
+            key = lambda entry: entry["cumulative_ms"], reverse = True
+        ),
+        "heaviest_dependencies": sorted(
+            ({"package": package, "cumulative_ms": milliseconds} for package, milliseconds in direct_dependencies(imports).items()),
+            key = lambda entry: entry["cumulative_ms"], reverse = True
+        )[:top],
+        "deferred_modules_imported": sorted({
+            entry["module"].split(".")[0] for entry in imports
+            if entry["module"].split(".")[0] in DEFERRED_MODULES
+        }),
+        "first_use_ms": json.loads(first_use.stdout),
+    }
@@ -0,0 +1,18 @@
+from typing import List
+
+def percentiles(samples: List[float]) -> dict:
+    """
+    Summarises latencies given in seconds as milliseconds.
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
@@ -0,0 +1,78 @@
+"""
+Maintenance commands, run from the repository root:
+
+    python -m app.cli ensure-indexes
+    python -m app.cli verify-indexes
+    python -m app.cli startup-profile
+    python -m app.cli emoji-table
+"""
+import argparse
+import asyncio
+import json
+import sys
+from app.core.indexes import ensure_indexes
+from app.dbs import connect_to_mongo, close_mongo_connection, get_database
+from app.core.emojis import write_emoji_table
+from app.benchmarks.query_plans import verify_query_plans
+from app.benchmarks.startup import profile_startup, STARTUP_BUDGET_MS
+
+async def ensure_indexes_command(args) -> int:
+    await connect_to_mongo()
+    try:
+        print(json.dumps(await ensure_indexes(get_database()), indent = 2))
+    finally:
+        await close_mongo_connection()
+    return 0
+
+async def verify_indexes_command(args) -> int:
+    await connect_to_mongo()
+    try:
+        report = await verify_query_plans(get_database())
+    finally:
+        await close_mongo_connection()
+
+    print(json.dumps(report, indent = 2))
+    failures = [shape["name"] for shape in report if shape["problems"]]
+    if failures:
+        print(f"{len(failures)} query shapes are not served by an index: {', '.join(failures)}", file = sys.stderr)
+        return 1
+    return 0
+
+async def startup_profile_command(args) -> int:
+    report = profile_startup(args.top)
+    print(json.dumps(report, indent = 2))
+    if report["deferred_modules_imported"]:
+        print(f"importing app.main loaded deferred modules: {', '.join(report['deferred_modules_imported'])}", file = sys.stderr)
+        return 1
+    if report["import_app_main_ms"] > args.budget_ms:
+        print(f"importing app.main took {report['import_app_main_ms']}ms, over the {args.budget_ms}ms budget", file = sys.stderr)
+        return 1
+    return 0
+
+async def emoji_table_command(args) -> int:
+    print(f"wrote {write_emoji_table()} emoji")
+    return 0
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(prog = "python -m app.cli", description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    ensure = commands.add_parser("ensure-indexes", help = "create or rebuild every index in the registry")
+    ensure.set_defaults(run = ensure_indexes_command)
+
+    verify = commands.add_parser("verify-indexes", help = "explain every router query shape and fail on COLLSCAN or in-memory SORT")
+    verify.set_defaults(run = verify_indexes_command)
+
+    startup = commands.add_parser("startup-profile", help = "report import and first-use initialization time, and fail when importing app.main exceeds --budget-ms")
+    startup.add_argument("--budget-ms", type = float, default = STARTUP_BUDGET_MS)
+    startup.add_argument("--top", type = int, default = 15, help = "number of third-party imports to list")
+    startup.set_defaults(run = startup_profile_command)
+
+    emoji = commands.add_parser("emoji-table", help = "regenerate app/core/emoji_table.txt from the installed emoji package")
+    emoji.set_defaults(run = emoji_table_command)
+
+    args = parser.parse_args(argv)
+    return asyncio.run(args.run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
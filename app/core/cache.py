@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from app.core.settings import settings
+from typing import Dict
+import bson
+import time
+
+# Caches exported on /metrics, by name.
+named_caches: Dict[str, "TTLCache"] = {}
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire after a time to live.
+    Not shared between worker processes, so every user of it must keep the
+    TTL short enough to bound how stale another worker's copy can get.
+    With max_bytes set, entries are also evicted until the sizes reported
+    by sizeof fit in that budget.
+    """
+    def __init__(
+            self,
+            max_size: int,
+            ttl_seconds: float,
+            max_bytes: Optional[int] = None,
+            sizeof: Optional[Callable[[Any], int]] = None,
+            name: Optional[str] = None
+        ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        # key -> [loads in flight, invalidations seen while loading]
+        self._loading: Dict[Hashable, list] = {}
+        if name is not None:
+            named_caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, expires_at, size = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds
+        if ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if key in self._entries:
+            self._remove(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl_seconds, size)
+        self.bytes += size
+        while len(self._entries) > self.max_size or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits loader and caches what it returns, unless the key was popped
+        while it ran: a writer pops after writing, so the loaded value may
+        predate that write and is returned without being cached.
+        """
+        loading = self._loading.setdefault(key, [0, 0])
+        loading[0] += 1
+        invalidations = loading[1]
+        try:
+            value = await loader()
+        finally:
+            loading[0] -= 1
+            if loading[0] == 0:
+                del self._loading[key]
+        if value is not None and loading[1] == invalidations:
+            self.set(key, value)
+        return value
+
+    def _remove(self, key: Hashable):
+        value, expires_at, size = self._entries.pop(key)
+        self.bytes -= size
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key in self._loading:
+            self._loading[key][1] += 1
+        if key not in self._entries:
+            return default
+        return self._remove(key)
+
+    def clear(self):
+        for loading in self._loading.values():
+            loading[1] += 1
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+document_cache = TTLCache(
+    settings.DOCUMENT_CACHE_MAX_SIZE,
+    settings.DOCUMENT_CACHE_TTL_SECONDS,
+    max_bytes = settings.DOCUMENT_CACHE_MAX_BYTES,
+    sizeof = lambda document: len(bson.encode(document)),
+    name = "document"
+)
@@ -0,0 +1,266 @@
+from fastapi import WebSocket, status
+from pydantic import ValidationError, parse_obj_as
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from typing import Dict, Iterable, List, Optional
+from app.core.cache import document_cache
+from app.core.events import event_bus, document_audience
+from app.core.search_cache import search_cache
+from app.core.models.content_patch import ContentSplice, MAX_PATCH_OPERATIONS
+from app.core.patches import apply_splices
+from app.core.settings import settings
+from app.dbs import get_document_collection
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EditSession:
+    """
+    In-memory copy of a document shared by every socket editing it in this
+    process. revision counts the edits accepted in the session; version is
+    the document version last read from or written to Mongo. pending holds
+    the edits accepted since the last write, with the user who made them;
+    while resetting, edits are not applied and only collected there, with
+    a revision of None.
+    """
+    def __init__(self, document_id: ObjectId):
+        self.document_id = document_id
+        self.content = ""
+        self.version = 0
+        self.revision = 0
+        self.flushed_revision = 0
+        self.pending: List[dict] = []
+        self.resetting = False
+        self.connections: Dict[WebSocket, str] = {}
+        self.lock = asyncio.Lock()
+        self.loading: Optional[asyncio.Future] = None
+        self.flusher: Optional[asyncio.Task] = None
+
+    @property
+    def dirty(self) -> bool:
+        return self.revision != self.flushed_revision
+
+class SessionDocumentNotFound(Exception):
+    pass
+
+class EditSessionManager:
+    """
+    Keeps one EditSession per document, relays edits between its sockets and
+    coalesces them into a single conditional write every flush_interval
+    seconds. The write only applies if every user who contributed to it is
+    still the author or an editor. If it does not (the document changed in
+    Mongo in the meantime, or a contributor lost access), the session is
+    reset to the stored content, users without access are disconnected and
+    every other socket gets back the edits of its user that were dropped.
+    """
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self.sessions: Dict[ObjectId, EditSession] = {}
+
+    async def _load(self, session: EditSession) -> Optional[dict]:
+        document = await get_document_collection().find_one({"_id": session.document_id}, {"content": 1, "version": 1, "author": 1, "editors": 1})
+        if document is None:
+            return None
+        session.content = document["content"]
+        session.version = document.get("version", 0)
+        return document
+
+    async def join(self, document_id: ObjectId, websocket: WebSocket, username: str) -> EditSession:
+        session = self.sessions.get(document_id)
+        if session is None:
+            session = EditSession(document_id)
+            session.loading = asyncio.ensure_future(self._load(session))
+            self.sessions[document_id] = session
+        try:
+            document = await session.loading
+        except Exception:
+            # Don't keep a failed load around for the next join to re-raise.
+            if self.sessions.get(document_id) is session:
+                del self.sessions[document_id]
+            raise
+        if document is None:
+            if self.sessions.get(document_id) is session:
+                del self.sessions[document_id]
+            raise SessionDocumentNotFound()
+
+        session.connections[websocket] = username
+        if session.flusher is None:
+            session.flusher = asyncio.create_task(self._flush_periodically(session))
+        await websocket.send_json({
+            "type": "init",
+            "revision": session.revision,
+            "content": session.content,
+            "users": sorted(set(session.connections.values()))
+        })
+        await self.broadcast(session, {"type": "join", "user": username}, exclude = websocket)
+        return session
+
+    async def leave(self, session: EditSession, websocket: WebSocket):
+        username = session.connections.pop(websocket, None)
+        if session.connections:
+            # Revoked sockets were already removed and announced.
+            if username is not None:
+                await self.broadcast(session, {"type": "leave", "user": username})
+            return
+
+        if session.flusher is not None:
+            session.flusher.cancel()
+            session.flusher = None
+        await self.flush(session)
+        if session.connections:
+            # Someone joined while the last edits were being written.
+            session.flusher = asyncio.create_task(self._flush_periodically(session))
+        elif self.sessions.get(session.document_id) is session:
+            del self.sessions[session.document_id]
+
+    async def receive(self, session: EditSession, websocket: WebSocket, message: dict):
+        if websocket not in session.connections:
+            return
+        if not isinstance(message, dict) or message.get("type") != "edit":
+            await websocket.send_json({"type": "error", "detail": "Unknown message type"})
+            return
+        try:
+            operations = parse_obj_as(List[ContentSplice], message.get("operations"))
+        except ValidationError:
+            await websocket.send_json({"type": "error", "detail": "Invalid edit operations"})
+            return
+        if not 0 < len(operations) <= MAX_PATCH_OPERATIONS:
+            await websocket.send_json({"type": "error", "detail": "Invalid edit operations"})
+            return
+
+        if session.resetting:
+            # The content is being reloaded; the edit comes back in the reset's dropped list.
+            session.pending.append({
+                "revision": None,
+                "operations": [operation.dict() for operation in operations],
+                "user": session.connections.get(websocket)
+            })
+            return
+        if message.get("base_revision") != session.revision:
+            await websocket.send_json({"type": "reject", "revision": session.revision, "content": session.content})
+            return
+        try:
+            session.content = apply_splices(session.content, operations)
+        except ValueError:
+            await websocket.send_json({"type": "reject", "revision": session.revision, "content": session.content})
+            return
+        session.revision += 1
+        edit = {
+            "revision": session.revision,
+            "operations": [operation.dict() for operation in operations],
+            "user": session.connections.get(websocket)
+        }
+        session.pending.append(edit)
+
+        await self.broadcast(session, {"type": "edit", **edit})
+
+    async def broadcast(self, session: EditSession, message: dict, exclude: Optional[WebSocket] = None):
+        sockets = [websocket for websocket in session.connections if websocket is not exclude]
+        await asyncio.gather(*[websocket.send_json(message) for websocket in sockets], return_exceptions = True)
+
+    async def _flush_periodically(self, session: EditSession):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush(session)
+            except Exception:
+                logger.exception("Could not flush edit session for document %s", session.document_id)
+
+    async def flush(self, session: EditSession):
+        async with session.lock:
+            if not session.dirty:
+                return
+            content, revision = session.content, session.revision
+            write_filter = {"_id": session.document_id, "version": session.version or None}
+            contributors = sorted({edit["user"] for edit in session.pending if edit["revision"] <= revision})
+            if contributors:
+                write_filter['$and'] = [{'$or': [{"author": username}, {"editors": username}]} for username in contributors]
+            document_collection = get_document_collection()
+            result = await document_collection.find_one_and_update(
+                write_filter,
+                {'$set': {"content": content}, '$inc': {"version": 1}},
+                projection = {"author": 1, "editors": 1, "public": 1, "version": 1},
+                return_document = ReturnDocument.AFTER
+            )
+            document_cache.pop(session.document_id)
+            if result is not None:
+                session.version = result["version"]
+                session.flushed_revision = revision
+                session.pending = [edit for edit in session.pending if edit["revision"] > revision]
+                search_cache.invalidate()
+                event_bus.publish(
+                    "edited", session.document_id, document_audience(result), private = not result["public"],
+                    version = result["version"], users = sorted(set(session.connections.values()))
+                )
+                return
+
+            session.resetting = True
+            try:
+                document = await self._load(session)
+                await self.revoke(session.document_id, allowed = document_audience(document) if document is not None else ())
+            except Exception:
+                # The next flush retries the write; edits collected meanwhile are rejected.
+                session.resetting = False
+                unapplied = {edit["user"] for edit in session.pending if edit["revision"] is None}
+                session.pending = [edit for edit in session.pending if edit["revision"] is not None]
+                await asyncio.gather(*[
+                    websocket.send_json({"type": "reject", "revision": session.revision, "content": session.content})
+                    for websocket, username in list(session.connections.items()) if username in unapplied
+                ], return_exceptions = True)
+                raise
+            finally:
+                session.resetting = False
+            dropped, session.pending = session.pending, []
+            if document is None:
+                return
+            session.revision += 1
+            session.flushed_revision = session.revision
+            await asyncio.gather(*[
+                websocket.send_json({
+                    "type": "reset",
+                    "revision": session.revision,
+                    "content": session.content,
+                    "dropped": [edit for edit in dropped if edit["user"] == username]
+                })
+                for websocket, username in list(session.connections.items())
+            ], return_exceptions = True)
+
+    async def revoke(self, document_id: ObjectId, allowed: Iterable[str]):
+        """
+        Disconnects the sockets of users not in allowed from the document's
+        session. Call after taking edit access away; to keep the edits those
+        users made while they still had access, flush the session first.
+        """
+        session = self.sessions.get(document_id)
+        if session is None:
+            return
+        allowed = set(allowed)
+        for websocket, username in list(session.connections.items()):
+            if username not in allowed:
+                session.connections.pop(websocket, None)
+                await websocket.close(code = status.WS_1008_POLICY_VIOLATION)
+                await self.broadcast(session, {"type": "leave", "user": username})
+
+    async def flush_document(self, document_id: ObjectId):
+        session = self.sessions.get(document_id)
+        if session is not None:
+            await self.flush(session)
+
+    async def revoke_user(self, username: str):
+        # Used when the account goes away: its pending edits are written first.
+        for session in list(self.sessions.values()):
+            if username in session.connections.values():
+                await self.flush(session)
+                await self.revoke(session.document_id, allowed = set(session.connections.values()) - {username})
+
+    async def close(self):
+        for session in list(self.sessions.values()):
+            if session.flusher is not None:
+                session.flusher.cancel()
+            await self.flush(session)
+            for websocket in list(session.connections):
+                await websocket.close(code = status.WS_1001_GOING_AWAY)
+        self.sessions.clear()
+
+edit_sessions = EditSessionManager(settings.COLLAB_FLUSH_INTERVAL_SECONDS)
@@ -0,0 +1,20 @@
+from functools import lru_cache
+from pathlib import Path
+
+# One emoji per line, generated from emoji.EMOJI_DATA by
+# `python -m app.cli emoji-table` so the package is not imported at startup.
+EMOJI_TABLE = Path(__file__).with_name("emoji_table.txt")
+
+@lru_cache(maxsize = None)
+def emoji_set() -> frozenset:
+    return frozenset(line for line in EMOJI_TABLE.read_text(encoding = "utf-8").split("\n") if line)
+
+def is_emoji(s) -> bool:
+    return s in emoji_set()
+
+def write_emoji_table(path: Path = EMOJI_TABLE) -> int:
+    from emoji import EMOJI_DATA
+
+    path.write_text("\n".join(sorted(EMOJI_DATA)) + "\n", encoding = "utf-8")
+    emoji_set.cache_clear()
+    return len(EMOJI_DATA)
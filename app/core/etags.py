@@ -0,0 +1,67 @@
+from fastapi import Response, status
+from pydantic import BaseModel
+from typing import Optional
+from app.core.serialization import page_response
+import hashlib
+
+def document_etag(document: dict) -> str:
+    return f'"{document["_id"]}-{document.get("version", 0)}"'
+
+def page_etag(page: BaseModel) -> str:
+    """
+    Weak validator for a list response: it changes whenever a document on
+    the page is added, removed or bumps its version, or the page metadata
+    changes.
+    """
+    fingerprint = hashlib.sha1(type(page).__name__.encode())
+    for name, value in page:
+        if name != "documents":
+            fingerprint.update(f"{name}={value};".encode())
+    for document in page.documents:
+        fingerprint.update(f"{document.id}-{document.version};".encode())
+    return f'W/"{fingerprint.hexdigest()}"'
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """
+    Compares an If-None-Match (weak comparison) or If-Match (strong
+    comparison) header against an entity tag.
+    """
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag.replace("W/", "", 1):
+            return True
+    return False
+
+def if_match_version(header: Optional[str], document_id: str) -> Optional[int]:
+    """
+    Extracts the version a client expects from an If-Match header carrying
+    a document ETag. Returns None when the header does not pin a version
+    and -1 when none of its tags belongs to this document.
+    """
+    if header is None or header.strip() == "*":
+        return None
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            continue
+        tagged_id, _, version = candidate.strip('"').rpartition("-")
+        if tagged_id == document_id and version.isdigit():
+            return int(version)
+    return -1
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code = status.HTTP_304_NOT_MODIFIED, headers = {"ETag": etag})
+
+def conditional_page(page: BaseModel, if_none_match: Optional[str]) -> Response:
+    etag = page_etag(page)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return page_response(page, headers = {"ETag": etag})
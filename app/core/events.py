@@ -0,0 +1,128 @@
+from bson.objectid import ObjectId
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+from app.core.settings import settings
+import asyncio
+import itertools
+import json
+
+class Subscription:
+    def __init__(self, username: str, queue_size: int):
+        self.username = username
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def close(self):
+        # None tells the stream to end; make room for it if the queue is full.
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+class EventBus:
+    """
+    In-process fan-out of document change events. Subscriptions are indexed
+    by username, and the documents a subscribed user has favourited map back
+    to that username, so publishing only touches the users an event is for
+    and idle subscribers cost nothing but their queue. Only subscribers in
+    the same worker process receive an event.
+    """
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.followers: Dict[ObjectId, Set[str]] = defaultdict(set)
+        self.following: Dict[str, Set[ObjectId]] = defaultdict(set)
+        self.sequence = itertools.count(1)
+
+    def subscribe(self, username: str) -> Subscription:
+        subscription = Subscription(username, self.queue_size)
+        self.subscriptions[username].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        username = subscription.username
+        self.subscriptions[username].discard(subscription)
+        if self.subscriptions[username]:
+            return
+        del self.subscriptions[username]
+        for document_id in self.following.pop(username, ()):
+            self._drop_follower(document_id, username)
+
+    def follow(self, username: str, document_id: ObjectId):
+        if username in self.subscriptions:
+            self.followers[document_id].add(username)
+            self.following[username].add(document_id)
+
+    def unfollow(self, username: str, document_id: ObjectId):
+        if document_id in self.following.get(username, ()):
+            self.following[username].discard(document_id)
+            self._drop_follower(document_id, username)
+
+    def _drop_follower(self, document_id: ObjectId, username: str):
+        followers = self.followers.get(document_id)
+        if followers is not None:
+            followers.discard(username)
+            if not followers:
+                del self.followers[document_id]
+
+    def publish(self, type: str, document_id: ObjectId, audience: Iterable[str], private: bool = False, **data):
+        """
+        Sends an event to its audience (author and editors) and to the
+        document's followers. Followers outside the audience cannot read a
+        private document, so they only hear that it became private, and are
+        then dropped.
+        """
+        event = {"id": next(self.sequence), "type": type, "document_id": str(document_id), **data}
+        audience = set(audience)
+        usernames = audience
+        if not private or type == "visibility":
+            usernames = audience | self.followers.get(document_id, set())
+        for username in usernames:
+            for subscription in self.subscriptions.get(username, ()):
+                subscription.push(event)
+        if type == "deleted":
+            for username in self.followers.pop(document_id, ()):
+                self.following[username].discard(document_id)
+        elif private:
+            for username in self.followers.get(document_id, set()) - audience:
+                self.unfollow(username, document_id)
+
+    def close(self):
+        for subscriptions in list(self.subscriptions.values()):
+            for subscription in subscriptions:
+                subscription.close()
+
+def document_audience(document: dict) -> list:
+    return [document["author"], *document.get("editors", [])]
+
+def format_event(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+async def stream_events(subscription: Subscription, keepalive_seconds: float):
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            if subscription.overflowed:
+                # Events were dropped: the client should refetch its lists.
+                subscription.overflowed = False
+                yield "event: overflow\ndata: {}\n\n"
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield format_event(event)
+    finally:
+        event_bus.unsubscribe(subscription)
+
+event_bus = EventBus(settings.EVENT_QUEUE_SIZE)
@@ -0,0 +1,111 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from prometheus_client import Histogram
+from app.core.settings import settings
+from functools import lru_cache
+from typing import Optional
+import asyncio
+import time
+
+@lru_cache(maxsize = None)
+def get_pwd_context():
+    # Built on first use: passlib and the bcrypt backend are slow to import.
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(password, hashed_password)
+
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds", "Time a hashing worker spent on one bcrypt hash or verify",
+    ["operation"],
+    buckets = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+PASSWORD_HASH_WAIT = Histogram(
+    "password_hash_wait_seconds", "Time a password hash or verify waited for a free hashing worker",
+    buckets = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+def timed(fn, *args):
+    # Runs on the worker, so the time excludes the wait for a free worker.
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+class HashingPoolSaturated(Exception):
+    pass
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded worker pool so a burst of logins does not
+    freeze the event loop. At most max_pending calls may be queued or
+    running; beyond that callers get HashingPoolSaturated right away
+    instead of waiting behind the backlog.
+    """
+    def __init__(self, workers: int, max_queue: int, executor: str = "thread"):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.executor_kind = executor
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers = self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers = self.workers, thread_name_prefix = "bcrypt")
+        return self._executor
+
+    async def _run(self, operation: str, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingPoolSaturated()
+
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            result, seconds = await asyncio.get_running_loop().run_in_executor(self._get_executor(), timed, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+        PASSWORD_HASH_LATENCY.labels(operation).observe(seconds)
+        PASSWORD_HASH_WAIT.observe(max(0.0, time.perf_counter() - start - seconds))
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait = False)
+            self._executor = None
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_QUEUE,
+    settings.PASSWORD_HASH_EXECUTOR
+)
@@ -0,0 +1,70 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from app.core.settings import settings
+from typing import Dict, List
+
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="user_username_index", unique=True),
+        IndexModel([("username", TEXT)], name="username_index", default_language="english"),
+        IndexModel([("username_key", ASCENDING)], name="user_username_key_index"),
+    ],
+    "documents": [
+        IndexModel(
+            [("public", ASCENDING), ("title", TEXT), ("author", TEXT), ("content", TEXT)],
+            name="document_search_index",
+            weights={"title": 10, "author": 5, "content": 1},
+            default_language="english"
+        ),
+        IndexModel([("public", ASCENDING), ("search_keywords", ASCENDING)], name="document_keywords_index"),
+        IndexModel([("public", ASCENDING), ("title_key", ASCENDING)], name="document_title_key_index"),
+        IndexModel([("public", ASCENDING), ("creation_date", DESCENDING), ("_id", DESCENDING)], name="document_public_index"),
+        IndexModel([("author", ASCENDING), ("creation_date", DESCENDING), ("_id", DESCENDING)], name="document_author_index"),
+        IndexModel([("editors", ASCENDING), ("creation_date", DESCENDING), ("_id", DESCENDING)], name="document_editors_index"),
+    ],
+    "favourites": [
+        IndexModel([("user", ASCENDING), ("document", ASCENDING)], name="favourite_unique_index", unique=True),
+        IndexModel([("user", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="favourite_user_index"),
+        IndexModel([("document", ASCENDING)], name="favourite_document_index"),
+    ],
+    "jobs": [
+        # finished_at is null until the job ends, so pending and running jobs never expire.
+        IndexModel([("finished_at", ASCENDING)], name="job_expiry_index", expireAfterSeconds=settings.JOB_RETENTION_SECONDS),
+        IndexModel([("status", ASCENDING), ("heartbeat_at", ASCENDING)], name="job_resume_index"),
+    ],
+}
+
+# Indexes earlier versions created that the registry replaced.
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    "documents": ["document_index"],
+}
+
+async def ensure_indexes(database: AsyncIOMotorDatabase) -> Dict[str, List[str]]:
+    """
+    Brings every collection's indexes in line with INDEXES. Existing indexes
+    whose definition changed under the same name are rebuilt; indexes not
+    mentioned in the registry are left alone unless they are retired.
+    Returns the names applied per collection.
+    """
+    applied = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        existing = await collection.index_information()
+        for retired in RETIRED_INDEXES.get(collection_name, []):
+            if retired in existing:
+                await collection.drop_index(retired)
+
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                    raise
+                await collection.drop_index(index.document["name"])
+                await collection.create_indexes([index])
+        applied[collection_name] = [index.document["name"] for index in indexes]
+    return applied
@@ -0,0 +1,125 @@
+from app.dbs import get_job_collection
+from app.core.settings import settings
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import uuid
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+# Work for each job type, called as work(job_id, **params).
+JOB_HANDLERS: Dict[str, Callable[..., Awaitable[None]]] = {}
+
+def job_handler(job_type: str):
+    def register(work: Callable[..., Awaitable[None]]):
+        JOB_HANDLERS[job_type] = work
+        return work
+    return register
+
+async def create_job(job_type: str, owner: str, **params) -> dict:
+    now = datetime.now()
+    job = {
+        "_id": uuid.uuid4().hex,
+        "type": job_type,
+        "owner": owner,
+        "params": params,
+        "status": JOB_PENDING,
+        "created_at": now,
+        "heartbeat_at": now,
+        "finished_at": None,
+        "progress": {},
+        "error": None
+    }
+    await get_job_collection().insert_one(job)
+    return job
+
+async def report_progress(job_id: str, **counters: int):
+    await get_job_collection().update_one(
+        {"_id": job_id},
+        {'$inc': {f"progress.{name}": count for name, count in counters.items()}, '$set': {"heartbeat_at": datetime.now()}}
+    )
+
+async def run_job(job_id: str):
+    """
+    Runs the job's handler with its stored parameters and records the
+    outcome on the job, so the status endpoint can report it after the
+    originating request has returned.
+    """
+    job_collection = get_job_collection()
+    job = await job_collection.find_one_and_update(
+        {"_id": job_id},
+        {'$set': {"status": JOB_RUNNING, "heartbeat_at": datetime.now()}},
+        return_document = ReturnDocument.AFTER
+    )
+    if job is None:
+        logger.warning("Job %s no longer exists", job_id)
+        return
+    try:
+        await JOB_HANDLERS[job["type"]](job_id, **job["params"])
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        await job_collection.update_one({"_id": job_id}, {'$set': {"status": JOB_FAILED, "error": str(e), "finished_at": datetime.now()}})
+    else:
+        await job_collection.update_one({"_id": job_id}, {'$set': {"status": JOB_DONE, "finished_at": datetime.now()}})
+
+class JobResumer:
+    """
+    Jobs start as background tasks of the request that created them, so a
+    restart or crash stops them midway. Every worker periodically claims
+    unfinished jobs that stopped reporting progress for stale_seconds and
+    runs them again; the claim is atomic, so only one worker resumes each
+    job, and handlers must be safe to repeat.
+    """
+    def __init__(self, interval_seconds: float, stale_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.stale_seconds = stale_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def claim_stale_job(self) -> Optional[dict]:
+        now = datetime.now()
+        return await get_job_collection().find_one_and_update(
+            {
+                "status": {'$in': [JOB_PENDING, JOB_RUNNING]},
+                "heartbeat_at": {'$lt': now - timedelta(seconds = self.stale_seconds)},
+                "params": {'$exists': True}
+            },
+            {'$set': {"heartbeat_at": now}}
+        )
+
+    async def resume_stale_jobs(self):
+        while True:
+            job = await self.claim_stale_job()
+            if job is None:
+                return
+            logger.info("Resuming %s job %s", job["type"], job["_id"])
+            await run_job(job["_id"])
+
+    async def _resume_periodically(self):
+        while True:
+            try:
+                await self.resume_stale_jobs()
+            except Exception:
+                logger.exception("Resuming stale jobs failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._resume_periodically())
+
+    async def close(self):
+        # A job cancelled here goes stale and is resumed after the restart.
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+job_resumer = JobResumer(settings.JOB_RESUME_INTERVAL_SECONDS, settings.JOB_STALE_SECONDS)
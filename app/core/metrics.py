@@ -0,0 +1,172 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from contextvars import ContextVar
+from fastapi import Response
+from typing import List, Optional
+from app.core.settings import settings
+from app.core.cache import named_caches
+from app.core.hashing import password_hasher
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled", ["method"])
+REQUEST_ERRORS = Counter("http_request_errors", "Responses with a 4xx or 5xx status", ["method", "route", "status"])
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "Mongo command round trips",
+    ["collection", "command"],
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+MONGO_COMMAND_FAILURES = Counter("mongodb_command_failures", "Mongo commands that returned an error", ["collection", "command"])
+PASSWORD_VERIFY_LATENCY = Histogram(
+    "password_verify_duration_seconds", "Password checks on login, including the wait for a hashing worker",
+    buckets = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+
+MAX_QUERIES_PER_REQUEST = 100
+FILTER_FIELDS = {
+    "find": "filter", "aggregate": "pipeline", "count": "query", "distinct": "query",
+    "findAndModify": "query", "update": "updates", "delete": "deletes"
+}
+
+# Query shapes run while handling the current request, None outside requests.
+request_queries: ContextVar[Optional[List[dict]]] = ContextVar("request_queries", default = None)
+
+def query_shape(value):
+    """
+    Replaces every literal in a filter with "?" so shapes can be logged
+    without user data and compared across requests.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [query_shape(item) for item in value[:1]]
+    return "?"
+
+def command_collection(event: monitoring.CommandStartedEvent) -> str:
+    target = event.command.get(event.command_name)
+    if isinstance(target, str):
+        return target
+    return str(event.command.get("collection", ""))
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Times every command sent by the Mongo client. motor runs pymongo calls
+    with a copy of the caller's context, so commands can also be attributed
+    to the request that issued them.
+    """
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        queries = request_queries.get()
+        shape = None
+        if queries is not None and len(queries) < MAX_QUERIES_PER_REQUEST:
+            shape = {"command": event.command_name, "collection": command_collection(event)}
+            field = FILTER_FIELDS.get(event.command_name)
+            if field in event.command:
+                shape[field] = query_shape(event.command[field])
+            if "sort" in event.command:
+                shape["sort"] = list(event.command["sort"])
+        self._pending[(event.connection_id, event.request_id)] = (command_collection(event), queries, shape)
+
+    def _finished(self, event, failed: bool):
+        collection, queries, shape = self._pending.pop((event.connection_id, event.request_id), ("", None, None))
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        if failed:
+            MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+        if shape is not None:
+            shape["ms"] = round(event.duration_micros / 1000, 2)
+            queries.append(shape)
+
+    def succeeded(self, event):
+        self._finished(event, False)
+
+    def failed(self, event):
+        self._finished(event, True)
+
+class StatsCollector:
+    def collect(self):
+        hasher = password_hasher.stats()
+        yield GaugeMetricFamily("password_hash_queue_depth", "Password hashes queued or running", value = hasher["queue_depth"])
+        yield CounterMetricFamily("password_hash_rejected", "Password hashes refused because the pool was saturated", value = hasher["rejected"])
+        yield GaugeMetricFamily("password_hash_max_seconds", "Longest time a hashing worker spent on one hash or verify", value = hasher["max_seconds"])
+
+        entries = GaugeMetricFamily("cache_entries", "Entries held by an in-process cache", labels = ["cache"])
+        size = GaugeMetricFamily("cache_bytes", "Bytes held by an in-process cache", labels = ["cache"])
+        hits = CounterMetricFamily("cache_hits", "Cache lookups that found an entry", labels = ["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that missed", labels = ["cache"])
+        evictions = CounterMetricFamily("cache_evictions", "Entries evicted to respect a cache's limits", labels = ["cache"])
+        for name, cache in named_caches.items():
+            stats = cache.stats()
+            entries.add_metric([name], stats["entries"])
+            size.add_metric([name], stats["bytes"])
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            evictions.add_metric([name], stats["evictions"])
+        yield from (entries, size, hits, misses, evictions)
+
+command_metrics = CommandMetrics()
+REGISTRY.register(StatsCollector())
+
+class MetricsMiddleware:
+    """
+    Records latency, in-flight requests and errors per route, and logs
+    requests slower than SLOW_REQUEST_SECONDS with the Mongo queries they
+    ran. Latency stops at the response headers so streaming responses are
+    not counted for as long as the client stays connected.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._routes = None
+
+    def route_name(self, scope) -> str:
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        response = {"status": 500, "elapsed": None}
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["elapsed"] = time.perf_counter() - started
+            await send(message)
+
+        queries = []
+        token = request_queries.set(queries)
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+            request_queries.reset(token)
+
+            elapsed = response["elapsed"] if response["elapsed"] is not None else time.perf_counter() - started
+            route = self.route_name(scope)
+            status = str(response["status"])
+            REQUEST_LATENCY.labels(method, route, status).observe(elapsed)
+            if response["status"] >= 400:
+                REQUEST_ERRORS.labels(method, route, status).inc()
+            if elapsed >= settings.SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    "Slow request %s %s -> %s in %.3fs, %d queries: %s",
+                    method, route, status, elapsed, len(queries), json.dumps(queries)
+                )
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type = CONTENT_TYPE_LATEST)
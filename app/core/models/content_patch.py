@@ -0,0 +1,18 @@
+from pydantic import BaseModel, conint, conlist, root_validator
+
+MAX_PATCH_OPERATIONS = 100
+
+class ContentSplice(BaseModel):
+    start: conint(ge=0)
+    end: conint(ge=0)
+    text: str = ""
+
+    @root_validator(skip_on_failure=True)
+    def check_range(cls, values):
+        if values["end"] < values["start"]:
+            raise ValueError("end must not be before start")
+        return values
+
+class ContentPatch(BaseModel):
+    base_version: conint(ge=0)
+    operations: conlist(ContentSplice, min_items=1, max_items=MAX_PATCH_OPERATIONS)
@@ -0,0 +1,36 @@
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pydantic import BaseModel
+from typing import AsyncIterator, Optional, Tuple, Type
+from app.core.serialization import construct_trusted, encode, model_row
+
+async def stream_ndjson(cursor: AsyncIOMotorCursor, model: Type[BaseModel]) -> AsyncIterator[bytes]:
+    """
+    Encodes documents one line at a time as the cursor yields them, so an
+    export holds a single batch in memory however large it is.
+    """
+    try:
+        async for document in cursor:
+            yield encode(model_row(construct_trusted(model, document))) + b"\n"
+    finally:
+        await cursor.close()
+
+async def read_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Splits a streamed body into numbered lines, buffering at most one
+    partial line. Lines longer than max_line_bytes are dropped as they
+    arrive and yielded as None so the caller can report them.
+    """
+    number = 0
+    buffer = b""
+    overlong = False
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, None if overlong or len(line) > max_line_bytes else line
+            overlong = False
+        if len(buffer) > max_line_bytes:
+            overlong = True
+            buffer = b""
+    if buffer or overlong:
+        yield number + 1, None if overlong else buffer
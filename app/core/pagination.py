@@ -0,0 +1,101 @@
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+from app.core.schemas.document import Document, DocumentFields, DocumentSummary, PaginatedDocument, PaginatedDocumentSummary
+from app.core.snippets import summary_projection, highlight
+from app.core.serialization import construct_trusted
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Union
+import base64
+import json
+
+KEYSET_SORT = [("creation_date", -1), ("_id", -1)]
+
+def encode_cursor(document: dict, field: str = "creation_date") -> str:
+    position = [document[field].isoformat(), str(document["_id"])]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        position, _id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(position), ObjectId(_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def keyset_filter(cursor: str, field: str = "creation_date") -> dict:
+    position, _id = decode_cursor(cursor)
+    return {'$or': [
+        {field: {"$lt": position}},
+        {field: position, "_id": {"$lt": _id}}
+    ]}
+
+def next_cursor(documents: List[dict], page_size: int, field: str = "creation_date") -> Optional[str]:
+    if len(documents) < page_size:
+        return None
+    return encode_cursor(documents[-1], field)
+
+async def paginate_documents(
+        collection: AsyncIOMotorCollection,
+        query: dict,
+        page: int = 1,
+        page_size: int = 10,
+        cursor: Optional[str] = None,
+        include_total: Optional[bool] = None,
+        projection: Optional[dict] = None,
+        sort: Optional[list] = None,
+        fields: DocumentFields = DocumentFields.full,
+        terms: List[str] = [],
+        count: Optional[Callable[[dict], Awaitable[int]]] = None
+    ) -> Union[PaginatedDocument, PaginatedDocumentSummary]:
+    """
+    Pages documents newest first. With a cursor the page is located by
+    seeking on (creation_date, _id), so every page costs the same as the
+    first one; otherwise it falls back to page numbers and the given sort.
+    Totals are counted in page-number mode unless include_total says
+    otherwise, and only on request in cursor mode, using count when given
+    instead of count_documents. A custom sort cannot be
+    resumed from a cursor, so those pages do not hand one out.
+
+    Summary pages leave content on the server and return a snippet of it
+    instead, with the given search terms highlighted.
+    """
+    if include_total is None:
+        include_total = cursor is None
+
+    if fields == DocumentFields.summary:
+        projection = {**summary_projection(terms), **(projection or {})}
+
+    if cursor is not None:
+        get_documents = collection.find({'$and': [query, keyset_filter(cursor)]}, projection).sort(KEYSET_SORT)
+    else:
+        get_documents = collection.find(query, projection).sort(sort or KEYSET_SORT).skip((page - 1) * page_size)
+    get_documents = await get_documents.limit(page_size).to_list(length = page_size)
+
+    page_fields = dict(
+        current_page = page if cursor is None else None,
+        total_pages = await (count or collection.count_documents)(query) // page_size + 1 if include_total else None,
+        page_size = page_size,
+        next_cursor = next_cursor(get_documents, page_size) if sort is None or cursor is not None else None
+    )
+
+    return build_page(get_documents, fields, terms, **page_fields)
+
+def build_page(
+        documents: List[dict],
+        fields: DocumentFields = DocumentFields.full,
+        terms: List[str] = [],
+        **page_fields
+    ) -> Union[PaginatedDocument, PaginatedDocumentSummary]:
+    if fields == DocumentFields.summary:
+        return PaginatedDocumentSummary.construct(
+            **page_fields,
+            documents = [construct_trusted(DocumentSummary, document, highlights = highlight(document["snippet"], terms)) for document in documents]
+        )
+    return PaginatedDocument.construct(
+        **page_fields,
+        documents = [construct_trusted(Document, document) for document in documents]
+    )
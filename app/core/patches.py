@@ -0,0 +1,38 @@
+from app.core.models.content_patch import ContentSplice
+from typing import List
+
+def apply_splices(content: str, operations: List[ContentSplice]) -> str:
+    """
+    Applies splices in order; each one addresses the content as left by the
+    previous one. Offsets count code points, like Mongo's $substrCP.
+    """
+    for operation in operations:
+        if operation.end > len(content):
+            raise ValueError("Splice range is outside the document content")
+        content = content[:operation.start] + operation.text + content[operation.end:]
+    return content
+
+def required_length(operations: List[ContentSplice]) -> int:
+    """
+    Smallest original content length for which every splice stays in range.
+    """
+    required = 0
+    delta = 0
+    for operation in operations:
+        required = max(required, operation.end - delta)
+        delta += len(operation.text) - (operation.end - operation.start)
+    return required
+
+def splice_pipeline(operations: List[ContentSplice]) -> List[dict]:
+    """
+    Update pipeline applying the splices inside Mongo, so only the edit
+    travels over the wire and the content is never read back.
+    """
+    return [
+        {'$set': {"content": {'$concat': [
+            {'$substrCP': ["$content", 0, operation.start]},
+            {'$literal': operation.text},
+            {'$substrCP': ["$content", operation.end, {'$strLenCP': "$content"}]}
+        ]}}}
+        for operation in operations
+    ]
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field as PydanticField
 from datetime import date
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from enum import Enum
 from app.core.models.object_id import PyObjectId
 from bson.objectid import ObjectId
 import pydantic
@@ -14,14 +15,70 @@ class Document(BaseModel):
     editors: List[str]
     public: bool
     creation_date: date
+    version: int = 0
     id: PyObjectId = PydanticField(default_factory=PyObjectId, alias="_id")
     class Config:
         allow_population_by_field_name = True
         arbitrary_types_allowed = True
         json_encoders = {ObjectId: str}
 
+class DocumentSummary(BaseModel):
+    title: str
+    emoji: str
+    author: str
+    editors: List[str]
+    public: bool
+    creation_date: date
+    snippet: str
+    highlights: List[Tuple[int, int]] = []
+    version: int = 0
+    id: PyObjectId = PydanticField(default_factory=PyObjectId, alias="_id")
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+class DocumentSuggestion(BaseModel):
+    title: str
+    emoji: str
+    id: PyObjectId = PydanticField(default_factory=PyObjectId, alias="_id")
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+class DocumentVersion(BaseModel):
+    version: int
+    content_length: int
+    id: PyObjectId = PydanticField(default_factory=PyObjectId, alias="_id")
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+class DocumentFields(str, Enum):
+    full = "full"
+    summary = "summary"
+
+class ImportLineError(BaseModel):
+    line: int
+    detail: str
+
+class DocumentImport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportLineError]
+
 class PaginatedDocument(BaseModel):
-    current_page: int
-    total_pages: int
+    current_page: Optional[int]
+    total_pages: Optional[int]
     page_size: int
+    next_cursor: Optional[str]
     documents: List[Document]
+
+class PaginatedDocumentSummary(BaseModel):
+    current_page: Optional[int]
+    total_pages: Optional[int]
+    page_size: int
+    next_cursor: Optional[str]
+    documents: List[DocumentSummary]
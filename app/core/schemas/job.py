@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field as PydanticField
+from datetime import datetime
+from typing import Dict, Optional
+
+class Job(BaseModel):
+    id: str = PydanticField(alias="_id")
+    type: str
+    status: str
+    created_at: datetime
+    finished_at: Optional[datetime]
+    progress: Dict[str, int] = {}
+    error: Optional[str]
+    class Config:
+        allow_population_by_field_name = True
@@ -5,7 +5,7 @@ from bson.objectid import ObjectId
 
 class User(BaseModel):
     username: str
-    favourites: List[str]
+    favourites: List[str] = []
     id: PyObjectId = PydanticField(default_factory=PyObjectId, alias="_id")
     class Config:
         allow_population_by_field_name = True
@@ -14,7 +14,7 @@ class User(BaseModel):
 
 class UserInDB(User):
     username: str
-    favourites: List[PyObjectId]
+    favourites: List[PyObjectId] = []
     id: PyObjectId = PydanticField(default_factory=PyObjectId, alias="_id")
     class Config:
         allow_population_by_field_name = True
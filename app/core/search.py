@@ -0,0 +1,46 @@
+from typing import List, Tuple
+import re
+import unicodedata
+
+TOKEN_EXPR = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_EXPR.findall(text.lower())
+
+def search_keywords(title: str) -> List[str]:
+    return sorted(set(tokenize(title)))
+
+def build_search_request(query: str, prefix: bool = False) -> Tuple[dict, bool]:
+    """
+    Builds the filter for a public document search and reports whether it
+    ranks by text score. Whole words go through the weighted text index;
+    with prefix matching the last word is looked up as an anchored range on
+    the search_keywords index instead.
+    """
+    tokens = tokenize(query)
+    search_request = {"public": True}
+
+    if prefix and tokens:
+        search_request["search_keywords"] = {"$regex": f"^{re.escape(tokens.pop())}"}
+
+    if tokens:
+        search_request["$text"] = {"$search": " ".join(tokens)}
+
+    return search_request, bool(tokens)
+
+def suggest_key(text: str) -> str:
+    """
+    Normalizes a title or username for prefix lookups: accents are
+    stripped, case is folded and runs of whitespace become one space, so
+    the keys sort and compare the way a user types.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return " ".join(folded.split())
+
+def prefix_filter(field: str, prefix: str) -> dict:
+    key = suggest_key(prefix)
+    # Keep a trailing space so "note " stops matching "notebook".
+    if key and prefix[-1:].isspace():
+        key += " "
+    return {field: {"$regex": f"^{re.escape(key)}"}}
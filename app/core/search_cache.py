@@ -0,0 +1,46 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+from typing import Awaitable, Callable, Hashable
+from app.core.cache import TTLCache
+from app.core.serialization import encode, model_row
+from app.core.settings import settings
+
+def page_bytes(page: BaseModel) -> int:
+    return sum(len(encode(model_row(document))) for document in page.documents)
+
+class SearchCache:
+    """
+    Caches search result pages, and separately their match counts, in
+    process. Page keys carry the corpus generation, which every document
+    write bumps, so one write retires all earlier pages at once; a page
+    computed while a write lands is stored under the generation it started
+    with and is never served afterwards. Counts only number the pages, so
+    they are kept for a longer TTL and survive writes. Writes handled by
+    another worker are not seen here: the page TTL bounds that staleness.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float, count_ttl_seconds: float, max_bytes: int):
+        self.generation = 0
+        self.pages = TTLCache(max_size, ttl_seconds, max_bytes = max_bytes, sizeof = page_bytes, name = "search")
+        self.counts = TTLCache(max_size, count_ttl_seconds, name = "search_count")
+
+    def invalidate(self):
+        self.generation += 1
+
+    def page_key(self, *parts: Hashable) -> tuple:
+        return (self.generation, *parts)
+
+    def counter(self, collection: AsyncIOMotorCollection, key: Hashable) -> Callable[[dict], Awaitable[int]]:
+        async def count_documents(query: dict) -> int:
+            count = self.counts.get(key)
+            if count is None:
+                count = await collection.count_documents(query)
+                self.counts.set(key, count)
+            return count
+        return count_documents
+
+search_cache = SearchCache(
+    settings.SEARCH_CACHE_MAX_SIZE,
+    settings.SEARCH_CACHE_TTL_SECONDS,
+    settings.SEARCH_COUNT_CACHE_TTL_SECONDS,
+    settings.SEARCH_CACHE_MAX_BYTES
+)
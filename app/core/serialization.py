@@ -0,0 +1,66 @@
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import AsyncIterator, Optional, Type, TypeVar
+import orjson
+
+# Pages with more documents than this are streamed in chunks.
+STREAM_PAGE_THRESHOLD = 200
+STREAM_CHUNK_SIZE = 50
+
+Model = TypeVar("Model", bound = BaseModel)
+
+def construct_trusted(model: Type[Model], document: dict, **values) -> Model:
+    """
+    Builds a response model from a document read from our own collections
+    without running validation. Only the model's fields are copied, and
+    datetimes stored for date fields are narrowed the way validation would.
+    Documents missing a required field fall back to full validation.
+    """
+    for name, field in model.__fields__.items():
+        if name in values:
+            continue
+        if field.alias in document:
+            value = document[field.alias]
+        elif name in document:
+            value = document[name]
+        elif field.required:
+            return model(**document, **values)
+        else:
+            value = field.get_default()
+        if field.type_ is date and isinstance(value, datetime):
+            value = value.date()
+        values[name] = value
+    return model.construct(**values)
+
+def model_row(model: BaseModel) -> dict:
+    return {field.alias: model.__dict__.get(name) for name, field in model.__fields__.items()}
+
+def encode(value) -> bytes:
+    return orjson.dumps(value, default = str)
+
+def page_response(page: BaseModel, headers: Optional[dict] = None) -> Response:
+    """
+    Encodes a page of trusted models with orjson, skipping FastAPI's
+    response_model validation. Large pages are streamed a chunk of
+    documents at a time.
+    """
+    body = model_row(page)
+    documents = body.pop("documents")
+    if len(documents) <= STREAM_PAGE_THRESHOLD:
+        body["documents"] = [model_row(document) for document in documents]
+        return Response(encode(body), media_type = "application/json", headers = headers)
+
+    body["documents"] = []
+    # Drop the closing "]}" so the documents can be appended to the array.
+    head = encode(body)[:-2]
+
+    async def chunks() -> AsyncIterator[bytes]:
+        yield head
+        for start in range(0, len(documents), STREAM_CHUNK_SIZE):
+            rows = b",".join(encode(model_row(document)) for document in documents[start:start + STREAM_CHUNK_SIZE])
+            yield rows if start == 0 else b"," + rows
+        yield b"]}"
+
+    return StreamingResponse(chunks(), media_type = "application/json", headers = headers)
@@ -1,13 +1,52 @@
-from typing import List, Union
+from typing import List, Optional, Union
 from pydantic import AnyHttpUrl, BaseSettings, validator
 
 class Settings(BaseSettings):
     PROJECT_NAME: str
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
     MONGODB_URL: str
+    MONGODB_DATABASE: str = "domperidog"
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 5000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_CONNECT_TIMEOUT_MS: int = 5000
+    MONGODB_SOCKET_TIMEOUT_MS: int = 30000
+    MONGODB_ENSURE_INDEXES: bool = True
     JWT_SECRET_KEY: str
     JWT_SIGNATURE_ALGORITHM: str
     JWT_TOKEN_EXPIRE_MINUTES: int
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    DOCUMENT_CACHE_TTL_SECONDS: int = 15
+    DOCUMENT_CACHE_MAX_SIZE: int = 10000
+    DOCUMENT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SEARCH_CACHE_TTL_SECONDS: int = 10
+    SEARCH_COUNT_CACHE_TTL_SECONDS: int = 60
+    SEARCH_CACHE_MAX_SIZE: int = 1000
+    SEARCH_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    SUGGEST_CACHE_TTL_SECONDS: int = 10
+    SUGGEST_CACHE_MAX_SIZE: int = 10000
+    SUGGEST_MAX_LIMIT: int = 25
+    PAGINATION_MAX_PAGE_SIZE: int = 100
+    PROFILE_FAVOURITES_LIMIT: int = 20
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+    IMPORT_MAX_ERRORS: int = 1000
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    JOB_RETENTION_SECONDS: int = 7 * 24 * 60 * 60
+    JOB_STALE_SECONDS: int = 300
+    JOB_RESUME_INTERVAL_SECONDS: float = 60.0
+    ACCOUNT_DELETION_BATCH_SIZE: int = 1000
+    COLLAB_FLUSH_INTERVAL_SECONDS: float = 2.0
+    EVENT_QUEUE_SIZE: int = 100
+    EVENT_KEEPALIVE_SECONDS: float = 15.0
+    SLOW_REQUEST_SECONDS: float = 1.0
+    WEB_CONCURRENCY: Optional[int] = None
+    GRACEFUL_SHUTDOWN_SECONDS: float = 30.0
 
     @validator("BACKEND_CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v: Union[str, List[str]]) -> Union[List[str], str]:
@@ -17,6 +56,12 @@ class Settings(BaseSettings):
             return v
         raise ValueError(v)
 
+    @validator("PASSWORD_HASH_EXECUTOR")
+    def check_password_hash_executor(cls, v: str) -> str:
+        if v not in ("thread", "process"):
+            raise ValueError("PASSWORD_HASH_EXECUTOR must be 'thread' or 'process'")
+        return v
+
     class Config:
         case_sensitive = True
         env_file = ".env"
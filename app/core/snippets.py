@@ -0,0 +1,34 @@
+from typing import List, Tuple
+import re
+
+SNIPPET_LENGTH = 200
+SNIPPET_CONTEXT = 60
+
+def summary_projection(terms: List[str] = []) -> dict:
+    """
+    Projects everything a DocumentSummary needs while leaving content on
+    the server; only a bounded snippet of it is sent back. When search
+    terms are given the snippet is centred on the first one found.
+    """
+    snippet_start = 0
+    if terms:
+        snippet_start = {'$max': [0, {'$subtract': [
+            {'$indexOfCP': [{'$toLower': "$content"}, terms[0]]},
+            SNIPPET_CONTEXT
+        ]}]}
+    return {
+        "title": 1,
+        "emoji": 1,
+        "author": 1,
+        "editors": 1,
+        "public": 1,
+        "creation_date": 1,
+        "version": 1,
+        "snippet": {'$substrCP': ["$content", snippet_start, SNIPPET_LENGTH]}
+    }
+
+def highlight(snippet: str, terms: List[str]) -> List[Tuple[int, int]]:
+    if not terms:
+        return []
+    expr = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in sorted(terms, key = len, reverse = True)) + ")", re.I)
+    return [(match.start(), match.end()) for match in expr.finditer(snippet)]
@@ -0,0 +1,39 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from typing import List
+from app.core.cache import TTLCache
+from app.core.search import prefix_filter, suggest_key
+from app.core.search_cache import search_cache
+from app.core.settings import settings
+
+suggestion_cache = TTLCache(settings.SUGGEST_CACHE_MAX_SIZE, settings.SUGGEST_CACHE_TTL_SECONDS, name = "suggest")
+
+async def suggest_documents(collection: AsyncIOMotorCollection, prefix: str, limit: int) -> List[dict]:
+    """
+    Public documents whose normalized title starts with prefix, in title
+    order. The lookup is a range over document_title_key_index; results are
+    cached per corpus generation, so any document write retires them.
+    """
+    if not suggest_key(prefix):
+        return []
+    key = ("documents", search_cache.generation, prefix, limit)
+    documents = suggestion_cache.get(key)
+    if documents is None:
+        query = {"public": True, **prefix_filter("title_key", prefix)}
+        documents = await collection.find(query, {"title": 1, "emoji": 1}).sort("title_key", 1).limit(limit).to_list(length = limit)
+        suggestion_cache.set(key, documents)
+    return documents
+
+async def suggest_users(collection: AsyncIOMotorCollection, prefix: str, limit: int) -> List[str]:
+    """
+    Usernames starting with prefix, case-insensitively, in order. Users who
+    just registered show up once cached results for their prefix expire.
+    """
+    if not suggest_key(prefix):
+        return []
+    key = ("users", prefix, limit)
+    usernames = suggestion_cache.get(key)
+    if usernames is None:
+        users = await collection.find(prefix_filter("username_key", prefix), {"username": 1}).sort("username_key", 1).limit(limit).to_list(length = limit)
+        usernames = [user["username"] for user in users]
+        suggestion_cache.set(key, usernames)
+    return usernames
@@ -0,0 +1,19 @@
+from app.core.settings import settings
+
+class InvalidToken(Exception):
+    pass
+
+# jose (and the cryptography backends it probes) is imported on first use
+# rather than when the app is imported.
+def encode_access_token(payload: dict) -> str:
+    from jose import jwt
+
+    return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm = settings.JWT_SIGNATURE_ALGORITHM)
+
+def decode_access_token(token: str) -> dict:
+    from jose import JWTError, jwt
+
+    try:
+        return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms = [settings.JWT_SIGNATURE_ALGORITHM])
+    except JWTError as error:
+        raise InvalidToken() from error
@@ -1,16 +1,52 @@
 import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from app.core.settings import settings
+from app.core.indexes import ensure_indexes
+from app.core.metrics import command_metrics
 
-mongo_client = pymongo.MongoClient(settings.MONGODB_URL)
-mongodb = mongo_client["domperidog"]
-user_collection = mongodb["users"]
-document_collection = mongodb["documents"]
+class MongoConnection:
+    client: AsyncIOMotorClient = None
 
-user_collection.create_index([('username', pymongo.TEXT)], name='username_index', default_language='english')
-document_collection.create_index([('author', pymongo.TEXT), ('title', pymongo.TEXT), ('content', pymongo.TEXT)], name='document_index', default_language='english')
+mongo = MongoConnection()
 
+async def connect_to_mongo():
+    mongo.client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize = settings.MONGODB_MAX_POOL_SIZE,
+        minPoolSize = settings.MONGODB_MIN_POOL_SIZE,
+        waitQueueTimeoutMS = settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS = settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS = settings.MONGODB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS = settings.MONGODB_SOCKET_TIMEOUT_MS,
+        event_listeners = [command_metrics]
+    )
 
-try:
-    mongo_client.list_database_names()
-except pymongo.errors.ConnectionFailure:
-    raise Exception("Mongo connection error")
+    try:
+        await mongo.client.list_database_names()
+    except pymongo.errors.ConnectionFailure:
+        raise Exception("Mongo connection error")
+
+    if settings.MONGODB_ENSURE_INDEXES:
+        await ensure_indexes(get_database())
+
+async def close_mongo_connection():
+    if mongo.client is not None:
+        mongo.client.close()
+        mongo.client = None
+
+def get_database():
+    if mongo.client is None:
+        raise Exception("Mongo connection is not open")
+    return mongo.client[settings.MONGODB_DATABASE]
+
+def get_user_collection() -> AsyncIOMotorCollection:
+    return get_database()["users"]
+
+def get_document_collection() -> AsyncIOMotorCollection:
+    return get_database()["documents"]
+
+def get_job_collection() -> AsyncIOMotorCollection:
+    return get_database()["jobs"]
+
+def get_favourite_collection() -> AsyncIOMotorCollection:
+    return get_database()["favourites"]
@@ -1,9 +1,22 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.settings import settings
+from app.dbs import connect_to_mongo, close_mongo_connection
+from app.core.hashing import password_hasher, HashingPoolSaturated
+from app.core.collaboration import edit_sessions
+from app.core.events import event_bus
+from app.core.jobs import job_resumer
+from app.core.metrics import MetricsMiddleware, metrics_response
 from app.API import login, users, documents
 
+async def drain_connections():
+    # Long-lived connections would otherwise keep a stopping worker alive.
+    # app.serve calls this as soon as it stops accepting connections; the
+    # shutdown handler covers other servers, and is a no-op after app.serve.
+    event_bus.close()
+    await edit_sessions.close()
+
 def get_application():
     app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -13,7 +26,28 @@ def get_application():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag"],
     )
+    app.add_middleware(MetricsMiddleware)
+
+    app.add_event_handler("startup", connect_to_mongo)
+    app.add_event_handler("startup", job_resumer.start)
+    app.add_event_handler("shutdown", drain_connections)
+    app.add_event_handler("shutdown", job_resumer.close)
+    app.add_event_handler("shutdown", close_mongo_connection)
+    app.add_event_handler("shutdown", password_hasher.shutdown)
+
+    @app.exception_handler(HashingPoolSaturated)
+    async def hashing_pool_saturated_handler(request: Request, exc: HashingPoolSaturated):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+            content={"detail": "Too many concurrent login attempts, try again shortly"}
+        )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return metrics_response()
 
     @app.get("/")
     async def root():
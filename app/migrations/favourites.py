@@ -0,0 +1,58 @@
+"""
+Moves the favourites arrays embedded in user documents into the
+favourites collection, one user at a time, and removes each array once
+its entries are stored. Safe to run repeatedly and to resume after an
+interruption:
+
+    python -m app.migrations.favourites
+"""
+import asyncio
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.dbs import connect_to_mongo, close_mongo_connection, get_user_collection, get_favourite_collection
+
+BATCH_SIZE = 1000
+
+async def migrate_favourites():
+    user_collection = get_user_collection()
+    favourite_collection = get_favourite_collection()
+    migrated_users = 0
+    migrated_favourites = 0
+
+    users = user_collection.find({"favourites": {"$exists": True}}, {"username": 1, "favourites": 1})
+    async for user in users:
+        favourites = user["favourites"]
+        # Arrays were appended to, so keep that order by spacing the
+        # timestamps one millisecond apart ending at the migration time.
+        migrated_at = datetime.now() - timedelta(milliseconds = len(favourites))
+        batch = []
+        for index, document_id in enumerate(favourites):
+            batch.append(UpdateOne(
+                {"user": user["username"], "document": document_id},
+                {"$setOnInsert": {"created_at": migrated_at + timedelta(milliseconds = index)}},
+                upsert = True
+            ))
+            if len(batch) == BATCH_SIZE:
+                migrated_favourites += (await favourite_collection.bulk_write(batch, ordered = False)).upserted_count
+                batch = []
+        if batch:
+            migrated_favourites += (await favourite_collection.bulk_write(batch, ordered = False)).upserted_count
+
+        await user_collection.update_one({"_id": user["_id"]}, {"$unset": {"favourites": ""}})
+        migrated_users += 1
+
+    if 'user_favourites_index' in await user_collection.index_information():
+        await user_collection.drop_index('user_favourites_index')
+
+    return migrated_users, migrated_favourites
+
+async def main():
+    await connect_to_mongo()
+    try:
+        users, favourites = await migrate_favourites()
+        print(f"Moved {favourites} favourites from {users} users")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Backfills the derived search fields (search keywords, title and username
+suggestion keys) on documents and users created before they were
+introduced. Safe to run repeatedly:
+
+    python -m app.migrations.search_fields
+"""
+import asyncio
+from pymongo import UpdateOne
+from app.core.search import search_keywords, suggest_key
+from app.dbs import connect_to_mongo, close_mongo_connection, get_document_collection, get_user_collection
+
+BATCH_SIZE = 1000
+
+async def backfill_search_fields():
+    document_collection = get_document_collection()
+    updated = 0
+    batch = []
+    missing = document_collection.find(
+        {'$or': [{"search_keywords": {"$exists": False}}, {"title_key": {"$exists": False}}]},
+        {"title": 1}
+    )
+    async for document in missing:
+        batch.append(UpdateOne(
+            {"_id": document["_id"]},
+            {"$set": {"search_keywords": search_keywords(document["title"]), "title_key": suggest_key(document["title"])}}
+        ))
+        if len(batch) == BATCH_SIZE:
+            updated += (await document_collection.bulk_write(batch, ordered = False)).modified_count
+            batch = []
+    if batch:
+        updated += (await document_collection.bulk_write(batch, ordered = False)).modified_count
+    return updated
+
+async def backfill_username_keys():
+    user_collection = get_user_collection()
+    updated = 0
+    batch = []
+    async for user in user_collection.find({"username_key": {"$exists": False}}, {"username": 1}):
+        batch.append(UpdateOne({"_id": user["_id"]}, {"$set": {"username_key": suggest_key(user["username"])}}))
+        if len(batch) == BATCH_SIZE:
+            updated += (await user_collection.bulk_write(batch, ordered = False)).modified_count
+            batch = []
+    if batch:
+        updated += (await user_collection.bulk_write(batch, ordered = False)).modified_count
+    return updated
+
+async def main():
+    await connect_to_mongo()
+    try:
+        print(f"Backfilled search fields on {await backfill_search_fields()} documents")
+        print(f"Backfilled username keys on {await backfill_username_keys()} users")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
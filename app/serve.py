@@ -0,0 +1,92 @@
+"""
+Entry point for the API, run from the repository root:
+
+    python -m app.serve --port 8000
+
+Indexes are ensured once here, before any worker starts. Workers are spawned
+(not forked) by uvicorn's supervisor, and each one opens its own Mongo pool on
+startup, sized by MONGODB_MAX_POOL_SIZE / MONGODB_MIN_POOL_SIZE per worker.
+On SIGTERM a worker stops accepting connections, ends event streams and
+editing sessions, then waits up to GRACEFUL_SHUTDOWN_SECONDS for in-flight
+requests before exiting.
+
+One worker is the default because several pieces of state live in the
+worker process and are not shared: the change feed only carries writes
+handled by the same worker, collaborative sessions on different workers
+overwrite each other and keep resetting, and the document, search and
+suggestion caches only see their own worker's writes (staleness is bounded
+by their TTLs). Run more workers only when clients that use the change
+feed or editing sessions are routed to a fixed worker.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from app.core.settings import settings
+from app.dbs import connect_to_mongo, close_mongo_connection
+from app.main import drain_connections
+
+logger = logging.getLogger("uvicorn.error")
+
+class DrainingServer(uvicorn.Server):
+    async def shutdown(self, sockets = None):
+        for server in self.servers:
+            server.close()
+
+        await drain_connections()
+
+        def force_exit():
+            logger.warning("Graceful shutdown timed out after %ss, closing remaining connections", settings.GRACEFUL_SHUTDOWN_SECONDS)
+            self.force_exit = True
+
+        deadline = asyncio.get_running_loop().call_later(settings.GRACEFUL_SHUTDOWN_SECONDS, force_exit)
+        try:
+            await super().shutdown(sockets = sockets)
+        finally:
+            deadline.cancel()
+
+async def prepare_database():
+    await connect_to_mongo()
+    await close_mongo_connection()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m app.serve", description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default = "0.0.0.0")
+    parser.add_argument("--port", type = int, default = 8000)
+    parser.add_argument("--workers", type = int, default = settings.WEB_CONCURRENCY or 1)
+    parser.add_argument("--log-level", default = "info")
+    args = parser.parse_args(argv)
+
+    # Creates the indexes (when MONGODB_ENSURE_INDEXES is set) and checks the
+    # server is reachable; the client is closed before any worker exists.
+    asyncio.run(prepare_database())
+    os.environ["MONGODB_ENSURE_INDEXES"] = "false"
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host = args.host,
+        port = args.port,
+        workers = args.workers,
+        log_level = args.log_level,
+        proxy_headers = True,
+    )
+    server = DrainingServer(config)
+    if args.workers > 1:
+        logger.warning(
+            "Change feed events, editing sessions and caches are per worker; "
+            "with %d workers clients must be routed to a fixed worker (see python -m app.serve --help)",
+            args.workers
+        )
+    logger.info(
+        "Starting %d workers with up to %d Mongo connections each (%d in total)",
+        args.workers, settings.MONGODB_MAX_POOL_SIZE, args.workers * settings.MONGODB_MAX_POOL_SIZE
+    )
+    if args.workers == 1:
+        server.run()
+    else:
+        Multiprocess(config, target = server.run, sockets = [config.bind_socket()]).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from app.benchmarks.startup import profile_startup, DEFERRED_MODULES, STARTUP_BUDGET_MS
+
+def test_import_defers_heavy_modules():
+    report = profile_startup()
+    assert DEFERRED_MODULES == ("emoji", "jose", "passlib")
+    assert report["deferred_modules_imported"] == []
+
+def test_import_within_budget():
+    report = profile_startup()
+    assert report["import_app_main_ms"] <= STARTUP_BUDGET_MS
+    assert set(report["first_use_ms"]) == {"emoji_table", "bcrypt_context", "jose"}